@@ -0,0 +1 @@
+"""Micro-benchmarks for hot data paths, with baseline regression gating."""
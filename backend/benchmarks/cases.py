@@ -0,0 +1,220 @@
+"""Benchmark cases for database operations, documents, serialization and SSE payloads.
+
+Each case is a setup function registered with `@benchmark`; it prepares state
+and returns the zero-argument operation to time. Cases that would otherwise
+grow state without bound time an operation together with its inverse, which
+is reflected in the case name.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from pydantic import TypeAdapter
+
+import database
+from models import Participant, Session
+from routers.sessions import build_stream_event
+from services import flow_control
+from services.document import Document
+from services.spill_store import SpillStore
+from utils import build_session_data, generate_avatar_url
+
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+SESSION_COUNTS = [100, 10_000]
+PARTICIPANT_COUNTS = [2, 50]
+CODE_SIZES = [1_000, 100_000]
+DOCUMENT_LINES = [10_000, 100_000]
+
+# Where spilled documents go during a run; benchmarks.run.main() points this at
+# a temporary directory and removes it when the run ends
+spill_dir: Optional[str] = None
+
+
+def benchmark(name: str):
+    """Register a setup function under `name`."""
+
+    def register(setup: Callable[[], Callable[[], object]]):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def reset_database() -> None:
+    """Empty the in-memory store, keeping spilled documents out of the real data dir."""
+    if spill_dir is None:
+        raise RuntimeError("benchmarks.cases.spill_dir is not set")
+    database.sessions.clear()
+    database.documents.clear()
+    database.participants.clear()
+    database.spill_store = SpillStore(spill_dir)
+    database.rebuild_indexes()
+
+
+def _participant(index: int) -> dict:
+    name = f"Participant {index}"
+    return {
+        "id": f"participant-{index}",
+        "name": name,
+        "avatar": generate_avatar_url(name),
+        "color": "#4ECDC4",
+        "isOnline": True,
+        "cursor": {"lineNumber": 1, "column": 1},
+        "isTyping": False,
+    }
+
+
+def populate(session_count: int, participant_count: int = 0) -> List[str]:
+    """Fill the store with sessions and return their IDs, oldest first."""
+    reset_database()
+    session_ids = []
+    for i in range(session_count):
+        session_data = build_session_data(f"Session {i}", "python")
+        database.create_session(session_data["id"], session_data)
+        for p in range(participant_count):
+            database.add_participant(session_data["id"], _participant(p))
+        session_ids.append(session_data["id"])
+    return session_ids
+
+
+for _sessions in SESSION_COUNTS:
+
+    @benchmark(f"create_session+delete[sessions={_sessions}]")
+    def _create_session(sessions=_sessions):
+        populate(sessions)
+
+        def op():
+            session_data = build_session_data("Benchmark", "python")
+            database.create_session(session_data["id"], session_data)
+            database.delete_session(session_data["id"])
+
+        return op
+
+    for _size in CODE_SIZES:
+
+        @benchmark(f"update_session_code[sessions={_sessions},code={_size}]")
+        def _update_code(sessions=_sessions, size=_size):
+            session_id = populate(sessions)[0]
+            code = "y" * size
+            version = iter(range(1, 10**12))
+            return lambda: database.update_session_code(session_id, code, next(version), "bench")
+
+    for _participants in PARTICIPANT_COUNTS:
+
+        @benchmark(f"update_participant[sessions={_sessions},participants={_participants}]")
+        def _update_participant(sessions=_sessions, participants=_participants):
+            session_id = populate(sessions, participants)[0]
+            participant_id = f"participant-{participants - 1}"
+            updates = {"cursor": {"lineNumber": 3, "column": 7}, "isTyping": True, "isOnline": None}
+            return lambda: database.update_participant(session_id, participant_id, updates)
+
+        @benchmark(f"remove_participant+add[sessions={_sessions},participants={_participants}]")
+        def _remove_participant(sessions=_sessions, participants=_participants):
+            session_id = populate(sessions, participants)[0]
+            participant = _participant(participants - 1)
+
+            def op():
+                database.remove_participant(session_id, participant["id"])
+                database.add_participant(session_id, participant)
+
+            return op
+
+        @benchmark(f"flow_control_recommend[sessions={_sessions},participants={_participants}]")
+        def _flow_control_recommend(sessions=_sessions, participants=_participants):
+            session_id = populate(sessions, participants)[0]
+            return lambda: flow_control.recommend(session_id)
+
+        @benchmark(f"participant_exists[sessions={_sessions},participants={_participants}]")
+        def _participant_exists(sessions=_sessions, participants=_participants):
+            session_id = populate(sessions, participants)[0]
+            name = _participant(participants - 1)["name"]
+            return lambda: database.participant_exists(session_id, name)
+
+
+for _size in CODE_SIZES:
+
+    @benchmark(f"session_serialize[code={_size}]")
+    def _session_serialize(size=_size):
+        session_data = {**build_session_data("Benchmark", "python"), "code": "z" * size}
+        return lambda: Session(**session_data).model_dump_json()
+
+    @benchmark(f"stream_payload[code={_size}]")
+    def _stream_payload(size=_size):
+        session_data = {**build_session_data("Benchmark", "python"), "code": "z" * size}
+        return lambda: build_stream_event(session_data)
+
+
+for _participants in PARTICIPANT_COUNTS:
+
+    @benchmark(f"participants_serialize[participants={_participants}]")
+    def _participants_serialize(participants=_participants):
+        adapter = TypeAdapter(List[Participant])
+        data = [_participant(p) for p in range(participants)]
+        return lambda: adapter.dump_json(adapter.validate_python(data))
+
+
+def _document_text(lines: int) -> str:
+    return "".join(f"    value_{i} = compute({i}, other_{i})\n" for i in range(lines))
+
+
+for _lines in DOCUMENT_LINES:
+
+    @benchmark(f"document_insert+delete[lines={_lines}]")
+    def _document_insert(lines=_lines):
+        document = Document(_document_text(lines))
+        offset = document.position_to_offset(lines // 2, 5)
+
+        def op():
+            document.insert(offset, "x = 1\n")
+            document.delete(offset, offset + 6)
+
+        return op
+
+    @benchmark(f"str_insert+delete[lines={_lines}]")
+    def _str_insert(lines=_lines):
+        # Flat-string equivalent of the case above, for comparison
+        state = [_document_text(lines)]
+        offset = len(state[0]) // 2
+
+        def op():
+            text = state[0][:offset] + "x = 1\n" + state[0][offset:]
+            state[0] = text[:offset] + text[offset + 6:]
+
+        return op
+
+    @benchmark(f"document_offset_to_position[lines={_lines}]")
+    def _document_offset_to_position(lines=_lines):
+        document = Document(_document_text(lines))
+        offset = len(document) * 3 // 4
+        return lambda: document.offset_to_position(offset)
+
+    @benchmark(f"document_position_to_offset[lines={_lines}]")
+    def _document_position_to_offset(lines=_lines):
+        document = Document(_document_text(lines))
+        return lambda: document.position_to_offset(lines * 3 // 4, 10)
+
+    @benchmark(f"document_slice[lines={_lines}]")
+    def _document_slice(lines=_lines):
+        document = Document(_document_text(lines))
+        start = document.position_to_offset(lines // 2, 1)
+        end = document.position_to_offset(lines // 2 + 50, 1)
+        return lambda: document.slice(start, end)
+
+    @benchmark(f"document_text[lines={_lines}]")
+    def _document_text_case(lines=_lines):
+        document = Document(_document_text(lines))
+
+        def op():
+            document.insert(0, "#")
+            document.delete(0, 1)
+            return document.text()
+
+        return op
+
+    @benchmark(f"apply_session_edits[lines={_lines}]")
+    def _apply_session_edits(lines=_lines):
+        session_id = populate(1)[0]
+        database.update_session_code(session_id, _document_text(lines), 1, "bench")
+        version = iter(range(2, 10**12))
+        edits = [((lines // 2, 5), (lines // 2, 5), "x"), ((lines // 2, 5), (lines // 2, 6), "")]
+        return lambda: database.apply_session_edits(session_id, edits, next(version), "bench")
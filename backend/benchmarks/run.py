@@ -0,0 +1,144 @@
+"""Run the micro-benchmarks and compare them against a stored baseline.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.run                 # compare against baseline.json
+    python -m benchmarks.run --save          # record a new baseline
+    python -m benchmarks.run -k participant  # only cases whose name matches
+
+Exits non-zero when any case is slower than its baseline by more than
+--threshold (a fraction, default 0.25).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from typing import Dict
+
+from benchmarks import cases
+from benchmarks.cases import CASES, reset_database
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+REPEAT = 5
+# Suspected regressions are re-measured this many times (keeping the best)
+# before failing, so one noisy sample does not fail the gate
+CONFIRM_RUNS = 3
+# Baselines are the median of this many runs, so they reflect a typical
+# machine state rather than its luckiest moment
+SAVE_RUNS = 3
+
+
+def measure(name: str) -> float:
+    """Best-of-REPEAT seconds per call for one case."""
+    op = CASES[name]()
+    timer = timeit.Timer(op)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def run(pattern: str = "") -> Dict[str, float]:
+    results = {}
+    for name in CASES:
+        if pattern in name:
+            results[name] = measure(name)
+            print(f"{name:<70} {results[name] * 1e6:12.2f} us")
+    reset_database()
+    return results
+
+
+def is_regression(seconds: float, base: float, threshold: float) -> bool:
+    return seconds / base - 1 > threshold
+
+
+def confirm(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> None:
+    """Re-measure apparent regressions in place, keeping the fastest sample."""
+    for _ in range(CONFIRM_RUNS):
+        suspects = [
+            name for name, seconds in results.items()
+            if name in baseline and is_regression(seconds, baseline[name], threshold)
+        ]
+        if not suspects:
+            return
+        for name in suspects:
+            results[name] = min(results[name], measure(name))
+    reset_database()
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> int:
+    """Print the comparison and return the number of regressions."""
+    regressions = 0
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  new      {name}")
+            continue
+        change = seconds / base - 1
+        if is_regression(seconds, base, threshold):
+            regressions += 1
+            print(f"  SLOWER   {name}: {change:+.0%} (limit {threshold:+.0%})")
+        elif change < -threshold:
+            print(f"  faster   {name}: {change:+.0%}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown fraction")
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ccl-bench-spill-") as spill_dir:
+        cases.spill_dir = spill_dir
+        return _main(args)
+
+
+def _main(args: argparse.Namespace) -> int:
+    results = run(args.pattern)
+
+    if args.save:
+        samples = {name: [seconds] for name, seconds in results.items()}
+        for _ in range(SAVE_RUNS - 1):
+            for name in samples:
+                samples[name].append(measure(name))
+        reset_database()
+        results = {name: statistics.median(values) for name, values in samples.items()}
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "results": baseline}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save first")
+        return 1
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    baseline = stored["results"]
+    # Timings are only comparable on the same Python minor version
+    if stored.get("python", "").rsplit(".", 1)[0] != platform.python_version().rsplit(".", 1)[0]:
+        print(f"Warning: baseline was recorded with Python {stored.get('python')}, this is {platform.python_version()}")
+
+    confirm(results, baseline, args.threshold)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 """Configuration and constants for the application."""
 
+import os
+
 # Default code templates for each language
 DEFAULT_CODE = {
     "javascript": "// Write your JavaScript code here\nconsole.log('Hello, World!');",
@@ -18,6 +20,78 @@ STALE_NO_PARTICIPANT_TTL = 5 * 60  # remove sessions idle without participants
 STALE_INACTIVE_TTL = 20 * 60       # remove sessions with no activity even if participants exist
 STALE_SWEEP_INTERVAL = 60          # how often to sweep for stale sessions
 
+# Warm restart: state is written here on shutdown and reloaded on startup
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshot.json.gz")
+STREAM_RECONNECT_DELAY_MS = 2000  # how long clients wait before re-opening streams on shutdown
+STREAM_EDIT_LOG_LENGTH = 64  # versions of range edits kept per session; older subscribers get the whole document
+
+# Memory budget for session documents; beyond it the least recently active
+# documents are compressed to SPILL_DIR and loaded back on next access
+SESSION_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "spill")
+SPILL_MIN_BYTES = 4 * 1024  # smaller documents are not worth spilling
+SPILL_SWEEP_INTERVAL = 1.0  # seconds between budget checks (the budget is a soft limit)
+
+# Multi-file sessions (additional files besides the main document)
+SESSION_MAX_FILES = 50
+FILE_PATH_MAX_LENGTH = 200
+# Files stay in memory (only main documents are spilled), so cap their size
+FILE_MAX_LENGTH = 256 * 1024  # characters
+
+# Server-side syntax diagnostics
+DIAGNOSTICS_DEBOUNCE_SECONDS = 0.3       # wait for typing to pause before parsing
+DIAGNOSTICS_MAX_CODE_LENGTH = 1_000_000  # skip parsing larger documents
+
+# Bootstrap (single-call join): gzip the response when the document is at least this large
+BOOTSTRAP_COMPRESS_MIN_BYTES = 32 * 1024
+BOOTSTRAP_GZIP_LEVEL = 6
+
+# Maximum number of sessions a single batch request may create or look up
+BATCH_MAX_ITEMS = 100
+
+# Rate limiting: (tokens per second, burst size) per request kind and scope
+RATE_LIMITS = {
+    "code": {"per_client": (10, 20), "per_session": (20, 40)},
+    "presence": {"per_client": (20, 40), "per_session": (60, 120)},
+    "session_create": {"per_client": (1, 10)},
+    "stream": {"per_client": (2, 10), "per_session": (5, 20)},
+    "batch": {"per_client": (1, 5)},
+    # Charged once per session created through POST /v1/batch/sessions: same
+    # sustained rate as single creates, with room for one full batch
+    "session_create_batch": {"per_client": (1, BATCH_MAX_ITEMS)},
+}
+GLOBAL_WRITE_LIMIT = (500, 1000)   # shared budget across all clients and kinds
+# Fraction of the global budget each kind must leave untouched; under overload
+# cursor/presence traffic is shed first so code edits keep getting through
+SHED_PRIORITY_RESERVE = {
+    "code": 0.0,
+    "session_create": 0.1,
+    "session_create_batch": 0.1,
+    "stream": 0.1,
+    "batch": 0.2,
+    "presence": 0.3,
+}
+RATE_LIMIT_BUCKET_IDLE_TTL = 5 * 60  # drop idle per-client/per-session buckets
+
+# Adaptive flow control: recommended client send intervals in milliseconds as
+# (base, max). Intervals stay at base until load passes FLOW_LOAD_THRESHOLD and
+# grow smoothly up to FLOW_MAX_LOAD_FACTOR extra times base at saturation.
+FLOW_CODE_DEBOUNCE_MS = (400, 3000)
+FLOW_CURSOR_THROTTLE_MS = (150, 2000)
+FLOW_LOAD_THRESHOLD = 0.5
+FLOW_MAX_LOAD_FACTOR = 4.0
+FLOW_QUEUE_DEPTH_SCALE = 4          # every this many queued session mutations adds 1x base
+FLOW_CURSOR_FREE_PARTICIPANTS = 4   # cursor throttle grows linearly beyond this many participants
+FLOW_INTERVAL_STEP_MS = 50          # recommendations are rounded to this step
+
+# Operator endpoints under /v1/admin require this token (Authorization: Bearer
+# <token>); when it is unset they are disabled and answer 404
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Admin session listing page sizes
+ADMIN_LIST_DEFAULT_LIMIT = 50
+ADMIN_LIST_MAX_LIMIT = 200
+
 # Server configuration
 HOST = "0.0.0.0"
 PORT = 3000
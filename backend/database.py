@@ -1,28 +1,379 @@
 """In-memory database for sessions and participants."""
 
+import asyncio
+import sys
 import time
-from typing import Dict, List, Any
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Deque, Dict, List, Any, Iterator, Optional, Tuple, Union
+
+from config import SESSION_MEMORY_BUDGET_BYTES, SPILL_DIR, SPILL_MIN_BYTES, STREAM_EDIT_LOG_LENGTH
+from services.document import Document
+from services.spill_store import SpillStore
 
 # In-memory storage (use a real database in production)
 sessions: Dict[str, Dict[str, Any]] = {}
 participants: Dict[str, List[Dict[str, Any]]] = {}
 
+# Secondary indexes, kept up to date on every mutation below: sorted (lastActivity, session_id)
+sessions_by_activity: List[Tuple[float, str]] = []
+sessions_by_language: Dict[str, List[Tuple[float, str]]] = {}
+
+# Sessions that received edits (range edits or full updates) keep their code as
+# a rope-backed Document. Their "code" key is only (re)filled from the document
+# when a full snapshot of the session is requested, i.e. by get_session/peek_session.
+documents: Dict[str, Document] = {}
+
+# The range edits that produced each of the last versions, so stream subscribers
+# can be sent changes instead of the whole document:
+# session_id -> deque of (version, lastClientId, edits), oldest first
+Edit = Tuple[Tuple[int, int], Tuple[int, int], str]
+edit_logs: Dict[str, Deque[Tuple[int, Optional[str], List[Edit]]]] = {}
+
+# Code bodies of idle sessions moved to disk: session_id -> (code length, bytes on disk).
+# A spilled session keeps its dict in `sessions` but without the "code" key.
+spill_store = SpillStore(SPILL_DIR)
+spilled: Dict[str, Tuple[int, int]] = {}
+memory_stats: Dict[str, float] = {
+    "residentBytes": 0,
+    # Part of residentBytes the budget sweep can free: code of at least SPILL_MIN_BYTES
+    "spillableBytes": 0,
+    "spills": 0,
+    "reloads": 0,
+    "reloadSecondsTotal": 0.0,
+    "reloadSecondsMax": 0.0,
+}
+
 
 def get_session(session_id: str) -> Dict[str, Any]:
-    """Get a session by ID."""
-    return sessions.get(session_id)
+    """Get a session by ID, loading its code back from disk if it was spilled.
+
+    Async callers should prefer `load_session`, which reads spilled code in a
+    worker thread. Existence checks should use `get_session_metadata`.
+    """
+    session = sessions.get(session_id)
+    if session is not None and session_id in spilled:
+        _reload_code(session_id)
+    elif session is not None and "code" not in session:
+        _materialize(session_id)
+    return session
+
+
+async def load_session(session_id: str) -> Dict[str, Any]:
+    """Like get_session, but reads and decompresses spilled code off the event loop."""
+    await ensure_loaded(session_id)
+    return get_session(session_id)
+
+
+async def ensure_loaded(session_id: str) -> None:
+    """Load spilled code back into memory (off the event loop) without building a snapshot."""
+    if session_id in spilled:
+        started = time.perf_counter()
+        version = sessions[session_id].get("version")
+        try:
+            code = await asyncio.to_thread(spill_store.read, session_id)
+        except FileNotFoundError:
+            # Replaced by a full update while reading
+            code = None
+        # Only install it if the session was not reloaded, changed or deleted meanwhile
+        session = sessions.get(session_id)
+        if code is not None and session_id in spilled and session.get("version") == version:
+            _install_reloaded(session_id, code, started)
+
+
+async def read_code(session_id: str) -> Optional[str]:
+    """The current code as a string, leaving the session's in-memory state untouched.
+
+    Spilled code is read from disk and a document's text is built from a copy
+    of its rope, both in a worker thread. Returns None for unknown sessions.
+    """
+    if session_id in spilled:
+        try:
+            return await asyncio.to_thread(spill_store.read, session_id)
+        except FileNotFoundError:
+            # Replaced by a full update while reading
+            pass
+    session = sessions.get(session_id)
+    if session is None:
+        return None
+    if session_id in documents and "code" not in session:
+        return await asyncio.to_thread(documents[session_id].copy().text)
+    return session.get("code", "")
+
+
+def get_edits_since(session_id: str, version: int) -> Optional[List[Tuple[int, Optional[str], List[Edit]]]]:
+    """The (version, lastClientId, edits) entries after `version`, oldest first.
+
+    Returns None when the log does not reach back to `version` (e.g. after a
+    language change, a spill or too many versions), i.e. when a subscriber at
+    `version` needs the whole document instead.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        return None
+    current = session.get("version", 0)
+    if version == current:
+        return []
+    log = edit_logs.get(session_id)
+    if not log or not log[0][0] <= version + 1 <= current or log[-1][0] != current:
+        return None
+    return [entry for entry in log if entry[0] > version]
+
+
+def peek_session(session_id: str) -> Dict[str, Any]:
+    """Get a full copy of a session without loading spilled code back into memory."""
+    session = sessions.get(session_id)
+    if session is None or session_id not in spilled:
+        return get_session(session_id)
+    return {**session, "code": spill_store.read(session_id)}
+
+
+def get_session_metadata(session_id: str) -> Dict[str, Any]:
+    """Get a session's metadata without copying its code body."""
+    session = sessions.get(session_id)
+    if session is None:
+        return None
+    return {
+        "id": session["id"],
+        "title": session["title"],
+        "createdAt": session["createdAt"],
+        "language": session["language"],
+        "version": session.get("version", 0),
+        "lastClientId": session.get("lastClientId"),
+        "lastActivity": session.get("lastActivity", 0),
+        "participantCount": len(participants.get(session_id, [])),
+        "codeLength": _code_length(session_id),
+    }
 
 
 def _now() -> float:
     return time.time()
 
 
+def _sorted_remove(index: List[Tuple[float, str]], entry: Tuple[float, str]) -> None:
+    position = bisect_left(index, entry)
+    if position < len(index) and index[position] == entry:
+        del index[position]
+
+
+def _index_add(session_id: str, session: Dict[str, Any]) -> None:
+    entry = (session["lastActivity"], session_id)
+    insort(sessions_by_activity, entry)
+    insort(sessions_by_language.setdefault(session["language"], []), entry)
+
+
+def _index_remove(session_id: str, session: Dict[str, Any]) -> None:
+    entry = (session["lastActivity"], session_id)
+    _sorted_remove(sessions_by_activity, entry)
+    language_index = sessions_by_language.get(session["language"])
+    if language_index is not None:
+        _sorted_remove(language_index, entry)
+        if not language_index:
+            sessions_by_language.pop(session["language"], None)
+
+
+def rebuild_indexes() -> None:
+    """Recompute indexes and memory accounting from scratch (e.g. after bulk loading sessions).
+
+    Expects every session to hold its code in memory; spilled state is reset.
+    """
+    sessions_by_activity[:] = sorted((s["lastActivity"], sid) for sid, s in sessions.items())
+    sessions_by_language.clear()
+    for entry in sessions_by_activity:
+        sessions_by_language.setdefault(sessions[entry[1]]["language"], []).append(entry)
+
+    documents.clear()
+    edit_logs.clear()
+    spilled.clear()
+    spill_store.clear()
+    code_sizes = [sys.getsizeof(s.get("code", "")) for s in sessions.values()]
+    memory_stats["residentBytes"] = sum(code_sizes) + sum(_files_size(s) for s in sessions.values())
+    memory_stats["spillableBytes"] = sum(_spillable(size) for size in code_sizes)
+
+
+def _files_size(session: Dict[str, Any]) -> int:
+    return sum(sys.getsizeof(f["content"]) for f in session.get("files", {}).values())
+
+
+def _code_length(session_id: str) -> int:
+    if session_id in spilled:
+        return spilled[session_id][0]
+    if session_id in documents:
+        return len(documents[session_id])
+    return len(sessions[session_id].get("code", ""))
+
+
+def _code_size(session_id: str) -> int:
+    """Approximate resident bytes of a session's code, as sys.getsizeof counts them."""
+    if session_id in documents:
+        # "code", when present, is the document's cached text and counted by nbytes
+        return documents[session_id].nbytes
+    session = sessions[session_id]
+    return sys.getsizeof(session["code"]) if "code" in session else 0
+
+
+def _spillable(size: int) -> int:
+    return size if size >= SPILL_MIN_BYTES else 0
+
+
+def _account(size_before: int, size_after: int) -> None:
+    """Record a change of one session's resident code size."""
+    memory_stats["residentBytes"] += size_after - size_before
+    memory_stats["spillableBytes"] += _spillable(size_after) - _spillable(size_before)
+
+
+def _drop_code(session_id: str) -> None:
+    """Forget a session's in-memory code in every representation."""
+    _account(_code_size(session_id), 0)
+    sessions[session_id].pop("code", None)
+    documents.pop(session_id, None)
+    edit_logs.pop(session_id, None)
+
+
+def _materialize(session_id: str) -> None:
+    """Fill "code" from the session's document (flat string shared with its cache)."""
+    size_before = _code_size(session_id)
+    sessions[session_id]["code"] = documents[session_id].text()
+    _account(size_before, _code_size(session_id))
+
+
+def _set_code(session_id: str, code: str) -> None:
+    """Replace a session's code, keeping memory accounting and the spill store in sync."""
+    if session_id in spilled:
+        spilled.pop(session_id)
+        spill_store.delete(session_id)
+    else:
+        _drop_code(session_id)
+    sessions[session_id]["code"] = code
+    _account(0, sys.getsizeof(code))
+
+
+def _document(session_id: str) -> Document:
+    """The session's rope-backed document, created from its flat code on first use."""
+    if session_id in spilled:
+        _reload_code(session_id)
+    document = documents.get(session_id)
+    if document is None:
+        size_before = _code_size(session_id)
+        document = Document(sessions[session_id].pop("code", ""))
+        documents[session_id] = document
+        _account(size_before, _code_size(session_id))
+    return document
+
+
+def _log_edits(session_id: str, version: int, client_id: str, edits: List[Edit]) -> None:
+    log = edit_logs.get(session_id)
+    if log is None:
+        log = edit_logs[session_id] = deque(maxlen=STREAM_EDIT_LOG_LENGTH)
+    log.append((version, client_id, edits))
+
+
+def _reload_code(session_id: str) -> None:
+    """Synchronous fallback for get_session; see load_session."""
+    started = time.perf_counter()
+    _install_reloaded(session_id, spill_store.read(session_id), started)
+
+
+def _install_reloaded(session_id: str, code: str, started: float) -> None:
+    spill_store.delete(session_id)
+    spilled.pop(session_id)
+    sessions[session_id]["code"] = code
+    _account(0, sys.getsizeof(code))
+
+    elapsed = time.perf_counter() - started
+    memory_stats["reloads"] += 1
+    memory_stats["reloadSecondsTotal"] += elapsed
+    memory_stats["reloadSecondsMax"] = max(memory_stats["reloadSecondsMax"], elapsed)
+
+
+async def enforce_memory_budget() -> int:
+    """Spill the least recently active documents until resident code fits the budget.
+
+    Compression and file writes run in a worker thread; a session that is
+    changed, reloaded or deleted meanwhile keeps its in-memory code. Called
+    periodically by the server, so the budget is a soft limit. Returns the
+    number of sessions spilled.
+
+    Sessions are only walked while some resident code is spillable: when the
+    rest (small documents, files) exceeds the budget on its own, the sweep
+    stops instead of rescanning every session; see `budgetUnreachable` in
+    get_memory_stats.
+    """
+    count = 0
+    if not _should_spill():
+        return count
+    for _, session_id in list(sessions_by_activity):
+        if not _should_spill():
+            break
+        if session_id not in sessions or session_id in spilled or _code_size(session_id) < SPILL_MIN_BYTES:
+            continue
+
+        version = sessions[session_id].get("version")
+        # Documents are written from a copy of the rope; the text is built in the worker thread
+        source = documents[session_id].copy() if session_id in documents else sessions[session_id]["code"]
+        length, disk_bytes = await asyncio.to_thread(_write_spill, session_id, source)
+
+        session = sessions.get(session_id)
+        if session is None or session_id in spilled or session.get("version") != version:
+            if session_id not in spilled:
+                spill_store.delete(session_id)
+            continue
+        _drop_code(session_id)
+        spilled[session_id] = (length, disk_bytes)
+        memory_stats["spills"] += 1
+        count += 1
+    return count
+
+
+def _should_spill() -> bool:
+    return memory_stats["residentBytes"] > SESSION_MEMORY_BUDGET_BYTES and memory_stats["spillableBytes"] > 0
+
+
+def _write_spill(session_id: str, source: Union[str, Document]) -> Tuple[int, int]:
+    code = source if isinstance(source, str) else source.text()
+    return len(code), spill_store.write(session_id, code)
+
+
+def get_memory_stats() -> Dict[str, Any]:
+    """Resident/spilled document sizes and reload latency for monitoring."""
+    reloads = memory_stats["reloads"]
+    return {
+        "budgetBytes": SESSION_MEMORY_BUDGET_BYTES,
+        "residentBytes": memory_stats["residentBytes"],
+        "spillableBytes": memory_stats["spillableBytes"],
+        # Over budget even with everything spillable spilled (too many small documents or files)
+        "budgetUnreachable": memory_stats["residentBytes"] - memory_stats["spillableBytes"] > SESSION_MEMORY_BUDGET_BYTES,
+        "spilledBytes": sum(disk_bytes for _, disk_bytes in spilled.values()),
+        "spilledSessions": len(spilled),
+        "spills": memory_stats["spills"],
+        "reloads": reloads,
+        "reloadLatencyAvgMs": memory_stats["reloadSecondsTotal"] / reloads * 1000 if reloads else 0.0,
+        "reloadLatencyMaxMs": memory_stats["reloadSecondsMax"] * 1000,
+    }
+
+
+def iter_sessions_by_activity(
+    before: Optional[Tuple[float, str]] = None,
+    language: Optional[str] = None,
+) -> Iterator[Tuple[float, str]]:
+    """Yield (lastActivity, session_id) newest first, strictly before `before` if given.
+
+    With `language`, only that language's index is walked.
+    """
+    index = sessions_by_activity if language is None else sessions_by_language.get(language, [])
+    end = len(index) if before is None else bisect_left(index, before)
+    for position in range(end - 1, -1, -1):
+        yield index[position]
+
+
 def _touch_session(session_id: str, *, participant_activity: bool = False) -> None:
     """Update session activity timestamps."""
     if session_id not in sessions:
         return
     now = _now()
+    _index_remove(session_id, sessions[session_id])
     sessions[session_id]["lastActivity"] = now
+    _index_add(session_id, sessions[session_id])
     if participant_activity:
         sessions[session_id]["lastParticipantActivity"] = now
 
@@ -36,27 +387,106 @@ def create_session(session_id: str, session_data: Dict[str, Any]) -> None:
         "lastParticipantActivity": now,
     }
     participants[session_id] = []
+    _index_add(session_id, sessions[session_id])
+    _account(0, sys.getsizeof(session_data.get("code", "")))
 
 
 def update_session_code(session_id: str, code: str, version: int, client_id: str) -> None:
-    """Update the code, version, and last client for a session."""
-    if session_id in sessions:
-        sessions[session_id]["code"] = code
-        sessions[session_id]["version"] = version
-        sessions[session_id]["lastClientId"] = client_id
-        _touch_session(session_id)
+    """Update the code, version, and last client for a session.
+
+    The new text is diffed against the session's document and applied as a
+    range edit, which is logged for stream subscribers. Spilled code is
+    replaced outright rather than read back to diff against.
+    """
+    if session_id not in sessions:
+        return
+    if session_id in spilled:
+        _set_code(session_id, code)
+    else:
+        document = _document(session_id)
+        size_before = _code_size(session_id)
+        edit = document.set_text(code)
+        sessions[session_id].pop("code", None)
+        _account(size_before, _code_size(session_id))
+        _log_edits(session_id, version, client_id, [edit] if edit else [])
+    sessions[session_id]["version"] = version
+    sessions[session_id]["lastClientId"] = client_id
+    _touch_session(session_id)
+
+
+def apply_session_edits(
+    session_id: str,
+    edits: List[Edit],
+    version: int,
+    client_id: str,
+) -> None:
+    """Apply range edits to a session's code through its rope-backed document.
+
+    Raises ValueError (leaving the session unchanged) if an edit is out of range.
+    """
+    if session_id not in sessions:
+        return
+    document = _document(session_id)
+    size_before = _code_size(session_id)
+    document.apply_edits(edits)
+    # The flat string is stale now; get_session rebuilds it on demand
+    sessions[session_id].pop("code", None)
+    _account(size_before, _code_size(session_id))
+    _log_edits(session_id, version, client_id, edits)
+
+    sessions[session_id]["version"] = version
+    sessions[session_id]["lastClientId"] = client_id
+    _touch_session(session_id)
 
 
 def update_session_language(session_id: str, language: str, code: str, version: int, client_id: str) -> None:
     """Update the language and code while bumping version and last client."""
     if session_id in sessions:
+        # Re-indexed under the new language by _touch_session below
+        _index_remove(session_id, sessions[session_id])
         sessions[session_id]["language"] = language
-        sessions[session_id]["code"] = code
+        _set_code(session_id, code)
         sessions[session_id]["version"] = version
         sessions[session_id]["lastClientId"] = client_id
         _touch_session(session_id)
 
 
+def get_files(session_id: str) -> Dict[str, Dict[str, Any]]:
+    """Get the additional files of a session keyed by path."""
+    session = sessions.get(session_id)
+    if session is None:
+        return {}
+    return session.get("files", {})
+
+
+def get_file(session_id: str, path: str) -> Dict[str, Any]:
+    """Get one additional file of a session."""
+    return get_files(session_id).get(path)
+
+
+def put_file(session_id: str, path: str, content: str, version: int, client_id: str) -> None:
+    """Create or replace a file; only that file's version changes."""
+    if session_id not in sessions:
+        return
+    files = sessions[session_id].setdefault("files", {})
+    previous = files.get(path)
+    if previous is not None:
+        memory_stats["residentBytes"] -= sys.getsizeof(previous["content"])
+    files[path] = {"content": content, "version": version, "lastClientId": client_id}
+    memory_stats["residentBytes"] += sys.getsizeof(content)
+    _touch_session(session_id)
+
+
+def delete_file(session_id: str, path: str) -> bool:
+    """Remove a file from a session."""
+    removed = get_files(session_id).pop(path, None)
+    if removed is None:
+        return False
+    memory_stats["residentBytes"] -= sys.getsizeof(removed["content"])
+    _touch_session(session_id)
+    return True
+
+
 def get_participants(session_id: str) -> List[Dict[str, Any]]:
     """Get all participants for a session."""
     return participants.get(session_id, [])
@@ -102,7 +532,15 @@ def remove_participant(session_id: str, participant_id: str) -> bool:
 
 def delete_session(session_id: str) -> None:
     """Delete a session and its participants."""
-    sessions.pop(session_id, None)
+    session = sessions.get(session_id)
+    if session is not None:
+        _index_remove(session_id, session)
+        if spilled.pop(session_id, None) is not None:
+            spill_store.delete(session_id)
+        else:
+            _drop_code(session_id)
+        memory_stats["residentBytes"] -= _files_size(session)
+        del sessions[session_id]
     participants.pop(session_id, None)
 
 
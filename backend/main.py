@@ -1,13 +1,19 @@
 """Main application entry point."""
 
 import asyncio
+import logging
+import re
 import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 import database
-from routers import sessions, participants
+from routers import admin, batch, files, sessions, participants
+from services import diagnostics, flow_control, lifecycle, session_actors
+from services.snapshot import load_snapshot, write_snapshot
+from services.rate_limiter import limiter
 from config import (
     CORS_ORIGINS,
     CORS_ALLOW_CREDENTIALS,
@@ -15,6 +21,9 @@ from config import (
     CORS_ALLOW_HEADERS,
     HOST,
     PORT,
+    SNAPSHOT_PATH,
+    SPILL_SWEEP_INTERVAL,
+    STREAM_RECONNECT_DELAY_MS,
     STALE_INACTIVE_TTL,
     STALE_NO_PARTICIPANT_TTL,
     STALE_SWEEP_INTERVAL,
@@ -27,20 +36,54 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS
+logger = logging.getLogger("uvicorn.error")
+
+
+@app.middleware("http")
+async def reject_while_draining(request: Request, call_next):
+    """Refuse new work once shutdown has begun so the snapshot is final."""
+    if lifecycle.is_draining() and request.url.path != "/health":
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": {"error": "Server is restarting", "code": 503}},
+            headers={"Retry-After": str(max(1, STREAM_RECONNECT_DELAY_MS // 1000))},
+        )
+    return await call_next(request)
+
+
+_SESSION_PATH = re.compile(r"^/v1/sessions/([^/]+)")
+
+
+@app.middleware("http")
+async def add_flow_control_headers(request: Request, call_next):
+    """Tell clients how often to send updates, for their session if the path names one."""
+    response = await call_next(request)
+    match = _SESSION_PATH.match(request.url.path)
+    response.headers.update(flow_control.headers(match.group(1) if match else None))
+    return response
+
+
+# Configure CORS. Added last so it is the outermost middleware: responses made by
+# the middlewares above (e.g. 503 while draining) must carry CORS headers too, or
+# cross-origin clients see a network error instead of a retryable status
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
     allow_credentials=CORS_ALLOW_CREDENTIALS,
     allow_methods=CORS_ALLOW_METHODS,
     allow_headers=CORS_ALLOW_HEADERS,
+    expose_headers=["Retry-After", flow_control.CODE_DEBOUNCE_HEADER, flow_control.CURSOR_THROTTLE_HEADER],
 )
 
 # Include routers
 app.include_router(sessions.router)
 app.include_router(participants.router)
+app.include_router(files.router)
+app.include_router(batch.router)
+app.include_router(admin.router)
 
 cleanup_task = None
+spill_task = None
 
 
 async def cleanup_stale_sessions():
@@ -61,40 +104,86 @@ async def cleanup_stale_sessions():
                 stale_session_ids.append(session_id)
 
         for session_id in stale_session_ids:
+            # Let queued mutations finish before the session disappears
+            await session_actors.stop_actor(session_id)
             database.delete_session(session_id)
+            diagnostics.forget(session_id)
+            limiter.forget_session(session_id)
+
+        # Actors started by requests that raced with a deletion
+        for session_id in list(session_actors.actors):
+            if session_id not in database.sessions:
+                await session_actors.stop_actor(session_id)
+        limiter.prune()
 
         await asyncio.sleep(STALE_SWEEP_INTERVAL)
 
 
+async def spill_idle_documents():
+    """Periodically move least recently active documents to disk while over the memory budget."""
+    while True:
+        await database.enforce_memory_budget()
+        await asyncio.sleep(SPILL_SWEEP_INTERVAL)
+
+
+@app.on_event("startup")
+async def restore_snapshot():
+    # Spilled documents from a previous process are only valid with its state
+    database.spill_store.clear()
+    started = time.perf_counter()
+    restored = load_snapshot(SNAPSHOT_PATH)
+    if restored is not None:
+        logger.info("Restored %d sessions from snapshot in %.3fs", restored, time.perf_counter() - started)
+
+
 @app.on_event("startup")
 async def start_cleanup_task():
-    global cleanup_task
+    global cleanup_task, spill_task
     cleanup_task = asyncio.create_task(cleanup_stale_sessions())
+    spill_task = asyncio.create_task(spill_idle_documents())
 
 
 @app.on_event("shutdown")
 async def stop_cleanup_task():
-    if cleanup_task:
-        cleanup_task.cancel()
-        try:
-            await cleanup_task
-        except asyncio.CancelledError:
-            pass
+    lifecycle.begin_drain()
+    for task in (cleanup_task, spill_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    await session_actors.stop_all()
+
+
+@app.on_event("shutdown")
+async def save_snapshot():
+    started = time.perf_counter()
+    saved = write_snapshot(SNAPSHOT_PATH)
+    logger.info("Saved %d sessions to snapshot in %.3fs", saved, time.perf_counter() - started)
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     """Root endpoint returning API information."""
     return {"message": "Code Connect Live API", "version": "1.0.0"}
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=HOST, port=PORT)
+
+    class DrainingServer(uvicorn.Server):
+        """Start draining on SIGTERM/SIGINT so open streams end before uvicorn waits on them."""
+
+        def handle_exit(self, sig, frame):
+            lifecycle.begin_drain()
+            super().handle_exit(sig, frame)
+
+    DrainingServer(uvicorn.Config(app, host=HOST, port=PORT)).run()
 
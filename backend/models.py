@@ -1,7 +1,9 @@
 """Pydantic models for request/response validation."""
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Literal, Optional
+
+from config import BATCH_MAX_ITEMS
 
 
 class CursorPosition(BaseModel):
@@ -45,6 +47,20 @@ class UpdateCodeRequest(BaseModel):
     clientId: str
 
 
+class TextEdit(BaseModel):
+    """A range replacement; positions refer to the text left by the previous edit."""
+    start: CursorPosition
+    end: CursorPosition
+    text: str
+
+
+class EditCodeRequest(BaseModel):
+    """Request model for applying range edits to session code."""
+    edits: List[TextEdit] = Field(min_length=1)
+    version: int
+    clientId: str
+
+
 class UpdateLanguageRequest(BaseModel):
     """Request model for updating session language."""
     language: str
@@ -55,6 +71,21 @@ class JoinSessionRequest(BaseModel):
     name: str
 
 
+class BootstrapRequest(BaseModel):
+    """Request model for joining a session and loading its state in one call."""
+    name: str
+    # Re-use this participant (e.g. after a reload) if it still exists under `name`
+    participantId: Optional[str] = None
+
+
+class BootstrapResponse(BaseModel):
+    """Everything a client needs to render a session and open its streams."""
+    session: Session
+    participant: Participant
+    participants: List[Participant]
+    resumeToken: str
+
+
 class UpdateParticipantRequest(BaseModel):
     """Request model for updating participant activity."""
     cursor: Optional[CursorPosition] = None
@@ -62,6 +93,119 @@ class UpdateParticipantRequest(BaseModel):
     isOnline: Optional[bool] = None
 
 
+class SessionMetadata(BaseModel):
+    """Model for session metadata without the code body."""
+    id: str
+    title: str
+    createdAt: str
+    language: str
+    version: int
+    lastClientId: Optional[str] = None
+    lastActivity: float
+    participantCount: int
+    codeLength: int
+
+
+class SessionListResponse(BaseModel):
+    """Response model for a page of the admin session listing."""
+    sessions: List[SessionMetadata]
+    nextCursor: Optional[str] = None
+
+
+class SessionFile(BaseModel):
+    """Model for an additional file in a multi-file session."""
+    path: str
+    content: str
+    version: int
+    lastClientId: Optional[str] = None
+
+
+class FileManifestEntry(BaseModel):
+    """Model for a file entry in a session manifest (no content)."""
+    path: str
+    version: int
+    size: int
+    lastClientId: Optional[str] = None
+
+
+class FileManifest(BaseModel):
+    """Model for the list of files in a session."""
+    sessionVersion: int
+    files: List[FileManifestEntry]
+
+
+class UpdateFileRequest(BaseModel):
+    """Request model for creating or updating a session file (version 0 creates)."""
+    content: str
+    version: int
+    clientId: str
+
+
+class SyntaxDiagnostic(BaseModel):
+    """Model for a single syntax diagnostic."""
+    severity: str
+    message: str
+    line: int
+    column: int
+
+
+class OutlineItem(BaseModel):
+    """Model for a class/function entry in a document outline."""
+    name: str
+    kind: str
+    line: int
+    endLine: Optional[int] = None
+    children: List["OutlineItem"] = []
+
+
+class DiagnosticsResponse(BaseModel):
+    """Response model for cached syntax diagnostics of a session."""
+    version: int
+    language: str
+    # skipped: no parser for the language, or the document is over DIAGNOSTICS_MAX_CODE_LENGTH
+    status: Literal["pending", "ready", "skipped"]
+    diagnostics: List[SyntaxDiagnostic]
+    outline: List[OutlineItem]
+
+
+class MemoryStats(BaseModel):
+    """Model for session document memory usage and spill-to-disk activity."""
+    budgetBytes: int
+    residentBytes: int
+    spillableBytes: int
+    budgetUnreachable: bool
+    spilledBytes: int
+    spilledSessions: int
+    spills: int
+    reloads: int
+    reloadLatencyAvgMs: float
+    reloadLatencyMaxMs: float
+
+
+class BatchCreateSessionsRequest(BaseModel):
+    """Request model for creating several sessions at once."""
+    sessions: List[CreateSessionRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class BatchSessionIdsRequest(BaseModel):
+    """Request model for looking up several sessions by ID."""
+    sessionIds: List[str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    countsOnly: bool = False
+
+
+class BatchSessionsResponse(BaseModel):
+    """Response model for batch session metadata lookups."""
+    sessions: List[SessionMetadata]
+    missing: List[str]
+
+
+class BatchParticipantsResponse(BaseModel):
+    """Response model for batch participant lookups."""
+    counts: Dict[str, int]
+    participants: Optional[Dict[str, List[Participant]]] = None
+    missing: List[str]
+
+
 class ErrorResponse(BaseModel):
     """Model for error responses."""
     error: str
@@ -0,0 +1,92 @@
+"""API router for operator/admin endpoints."""
+
+import base64
+import hmac
+import time
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from config import ADMIN_LIST_DEFAULT_LIMIT, ADMIN_LIST_MAX_LIMIT, ADMIN_TOKEN
+from models import MemoryStats, SessionListResponse
+import database
+
+
+async def require_admin_token(authorization: Optional[str] = Header(None)) -> None:
+    """Session IDs are the share links, so listing them must stay private to operators."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Not found", "code": 404}
+        )
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={"error": "Invalid admin token", "code": 403}
+        )
+
+
+router = APIRouter(
+    prefix="/v1/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+
+def _encode_cursor(position: Tuple[float, str]) -> str:
+    last_activity, session_id = position
+    raw = f"{last_activity!r}|{session_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        last_activity, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return float(last_activity), session_id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Invalid cursor", "code": 400}
+        )
+
+
+@router.get("/sessions", response_model=SessionListResponse)
+async def list_sessions(
+    language: Optional[str] = None,
+    activeWithin: Optional[float] = Query(None, gt=0, description="Only sessions active in the last N seconds"),
+    minParticipants: Optional[int] = Query(None, ge=0),
+    maxParticipants: Optional[int] = Query(None, ge=0),
+    limit: int = Query(ADMIN_LIST_DEFAULT_LIMIT, ge=1, le=ADMIN_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+):
+    """List live sessions, most recently active first, one cursor page at a time."""
+    active_since = time.time() - activeWithin if activeWithin else None
+    before = _decode_cursor(cursor) if cursor else None
+
+    page = []
+    next_cursor = None
+    # A language filter walks that language's own activity index, so rare languages are cheap
+    for position in database.iter_sessions_by_activity(before, language or None):
+        last_activity, session_id = position
+        # The activity index is sorted, so everything after this is older still
+        if active_since is not None and last_activity < active_since:
+            break
+        participant_count = len(database.participants.get(session_id, []))
+        if minParticipants is not None and participant_count < minParticipants:
+            continue
+        if maxParticipants is not None and participant_count > maxParticipants:
+            continue
+        if len(page) == limit:
+            next_cursor = _encode_cursor(page_end)
+            break
+        page.append(database.get_session_metadata(session_id))
+        page_end = position
+
+    return {"sessions": page, "nextCursor": next_cursor}
+
+
+@router.get("/metrics/memory", response_model=MemoryStats)
+async def memory_metrics():
+    """Resident vs. spilled session document bytes and reload latency."""
+    return database.get_memory_stats()
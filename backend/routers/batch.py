@@ -0,0 +1,74 @@
+"""API router for bulk session and participant endpoints."""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from models import (
+    BatchCreateSessionsRequest,
+    BatchParticipantsResponse,
+    BatchSessionIdsRequest,
+    BatchSessionsResponse,
+    Session,
+)
+from config import SUPPORTED_LANGUAGES
+from services.rate_limiter import enforce_rate_limit, rate_limit
+from utils import build_session_data
+import database
+
+router = APIRouter(
+    prefix="/v1/batch",
+    tags=["batch"],
+    dependencies=[Depends(rate_limit("batch"))],
+)
+
+
+@router.post("/sessions", status_code=status.HTTP_201_CREATED, response_model=List[Session])
+async def create_sessions(request: BatchCreateSessionsRequest, http_request: Request):
+    """Create several coding sessions in one request; all or nothing."""
+    unsupported = sorted({s.language for s in request.sessions if s.language not in SUPPORTED_LANGUAGES})
+    if unsupported:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": f"Unsupported language: {', '.join(unsupported)}", "code": 400}
+        )
+    # Each created session costs a token, so batching can't bypass the creation rate
+    enforce_rate_limit("session_create_batch", http_request, cost=len(request.sessions))
+
+    created = []
+    for item in request.sessions:
+        session_data = build_session_data(item.title, item.language)
+        database.create_session(session_data["id"], session_data)
+        created.append(session_data)
+    return created
+
+
+@router.post("/sessions/query", response_model=BatchSessionsResponse)
+async def get_sessions_metadata(request: BatchSessionIdsRequest):
+    """Get metadata (without code bodies) for several sessions."""
+    found = []
+    missing = []
+    for session_id in request.sessionIds:
+        metadata = database.get_session_metadata(session_id)
+        if metadata is None:
+            missing.append(session_id)
+        else:
+            found.append(metadata)
+    return {"sessions": found, "missing": missing}
+
+
+@router.post("/participants/query", response_model=BatchParticipantsResponse)
+async def get_sessions_participants(request: BatchSessionIdsRequest):
+    """Get participant counts, and unless `countsOnly` the lists, for several sessions."""
+    counts = {}
+    lists = None if request.countsOnly else {}
+    missing = []
+    for session_id in request.sessionIds:
+        if session_id not in database.sessions:
+            missing.append(session_id)
+            continue
+        session_participants = database.get_participants(session_id)
+        counts[session_id] = len(session_participants)
+        if lists is not None:
+            lists[session_id] = session_participants
+    return {"counts": counts, "participants": lists, "missing": missing}
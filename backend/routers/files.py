@@ -0,0 +1,168 @@
+"""API router for multi-file session endpoints.
+
+Besides its main document (`code`/`version`), a session can hold a small tree
+of additional files. Each file has its own version and change stream, so an
+edit to one file never conflicts with or re-sends another.
+"""
+
+import asyncio
+import json
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+import database
+from config import FILE_MAX_LENGTH, FILE_PATH_MAX_LENGTH, SESSION_MAX_FILES, STREAM_RECONNECT_DELAY_MS
+from models import FileManifest, SessionFile, UpdateFileRequest
+from services import lifecycle
+from services.rate_limiter import rate_limit
+from services.session_actors import run_in_session
+
+router = APIRouter(prefix="/v1/sessions", tags=["files"])
+
+_PATH_SEGMENT = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]*$")
+
+
+def _require_session(session_id: str) -> None:
+    if not database.get_session_metadata(session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Session not found", "code": 404}
+        )
+
+
+def _validate_path(path: str) -> None:
+    segments = path.split("/")
+    if len(path) > FILE_PATH_MAX_LENGTH or not all(_PATH_SEGMENT.match(segment) for segment in segments):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": f"Invalid file path: {path}", "code": 400}
+        )
+
+
+def _file_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={"error": "File not found", "code": 404}
+    )
+
+
+@router.get("/{sessionId}/files", response_model=FileManifest)
+async def get_file_manifest(sessionId: str):
+    """List a session's files with versions and sizes, without their content."""
+    metadata = database.get_session_metadata(sessionId)
+    if not metadata:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Session not found", "code": 404}
+        )
+    files = [
+        {
+            "path": path,
+            "version": file["version"],
+            "size": len(file["content"]),
+            "lastClientId": file["lastClientId"],
+        }
+        for path, file in sorted(database.get_files(sessionId).items())
+    ]
+    return {"sessionVersion": metadata["version"], "files": files}
+
+
+@router.get("/{sessionId}/files/{path:path}", response_model=SessionFile)
+async def get_file(sessionId: str, path: str):
+    """Get one file's content and version."""
+    _require_session(sessionId)
+    file = database.get_file(sessionId, path)
+    if file is None:
+        raise _file_not_found()
+    return {"path": path, **file}
+
+
+@router.put("/{sessionId}/files/{path:path}", dependencies=[Depends(rate_limit("code"))])
+async def put_file(sessionId: str, path: str, request: UpdateFileRequest):
+    """Create a file (version 0) or update it against its current version."""
+    _require_session(sessionId)
+    _validate_path(path)
+    if len(request.content) > FILE_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": f"Files are limited to {FILE_MAX_LENGTH} characters", "code": 400}
+        )
+
+    def apply():
+        file = database.get_file(sessionId, path)
+        current_version = file["version"] if file else 0
+
+        if request.version != current_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "error": "Version conflict",
+                    "code": 409,
+                    "codeContent": file["content"] if file else "",
+                    "version": current_version,
+                },
+            )
+        if file is None and len(database.get_files(sessionId)) >= SESSION_MAX_FILES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": f"Sessions are limited to {SESSION_MAX_FILES} files", "code": 400}
+            )
+
+        new_version = current_version + 1
+        database.put_file(sessionId, path, request.content, new_version, request.clientId)
+        return {"version": new_version}
+
+    return await run_in_session(sessionId, apply)
+
+
+@router.delete("/{sessionId}/files/{path:path}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_file(sessionId: str, path: str):
+    """Remove a file from the session."""
+    _require_session(sessionId)
+    removed = await run_in_session(sessionId, lambda: database.delete_file(sessionId, path))
+    if not removed:
+        raise _file_not_found()
+    return None
+
+
+@router.get("/{sessionId}/streams/files/{path:path}", dependencies=[Depends(rate_limit("stream"))])
+async def stream_file(sessionId: str, path: str):
+    """Server-sent events stream of changes to a single file."""
+    _require_session(sessionId)
+    if database.get_file(sessionId, path) is None:
+        raise _file_not_found()
+
+    async def event_generator():
+        last_version = None
+        try:
+            while True:
+                if lifecycle.is_draining():
+                    # Server is restarting; tell the client to re-open the stream shortly
+                    yield f"event: reconnect\ndata: {json.dumps({'retryMs': STREAM_RECONNECT_DELAY_MS})}\n\n"
+                    break
+                file = database.get_file(sessionId, path)
+                if file is None:
+                    yield f"event: deleted\ndata: {json.dumps({'path': path})}\n\n"
+                    break
+
+                if file["version"] != last_version:
+                    last_version = file["version"]
+                    payload = json.dumps({
+                        "path": path,
+                        "content": file["content"],
+                        "version": file["version"],
+                        "sourceClientId": file["lastClientId"],
+                    })
+                    yield f"data: {payload}\n\n"
+
+                await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            return
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    )
@@ -1,25 +1,41 @@
 """API router for participant management endpoints."""
 
 import asyncio
+import gzip
 import json
 import uuid
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
 
 import database
-from models import JoinSessionRequest, Participant, UpdateParticipantRequest
-from utils import generate_avatar_url, generate_color
+from config import BOOTSTRAP_COMPRESS_MIN_BYTES, BOOTSTRAP_GZIP_LEVEL, STREAM_RECONNECT_DELAY_MS
+from models import (
+    BootstrapRequest,
+    BootstrapResponse,
+    JoinSessionRequest,
+    Participant,
+    UpdateParticipantRequest,
+)
+from services import lifecycle
+from services.rate_limiter import rate_limit
+from services.session_actors import run_in_session
+from utils import (
+    decode_resume_token,
+    encode_resume_token,
+    generate_avatar_url,
+    generate_color,
+    participants_digest,
+)
 
 router = APIRouter(prefix="/v1/sessions", tags=["participants"])
 
 
 @router.get("/{sessionId}/participants", response_model=List[Participant])
-def get_participants(sessionId: str):
+async def get_participants(sessionId: str):
     """Get all participants in a session."""
-    session = database.get_session(sessionId)
-    if not session:
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
@@ -28,48 +44,133 @@ def get_participants(sessionId: str):
     return database.get_participants(sessionId)
 
 
-@router.post("/{sessionId}/participants", response_model=Participant)
-def join_session(sessionId: str, request: JoinSessionRequest):
+@router.post(
+    "/{sessionId}/participants",
+    response_model=Participant,
+    dependencies=[Depends(rate_limit("presence"))],
+)
+async def join_session(sessionId: str, request: JoinSessionRequest):
     """Join a session as a participant."""
-    session = database.get_session(sessionId)
-    if not session:
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
         )
     
-    # Check if participant name already exists in this session
-    if database.participant_exists(sessionId, request.name):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={"error": "Participant with this name already exists", "code": 409}
-        )
-    
-    participant_data = {
+    participant_data = _new_participant(request.name)
+
+    def apply():
+        _check_name_available(sessionId, request.name)
+        database.add_participant(sessionId, participant_data)
+        return participant_data
+
+    return await run_in_session(sessionId, apply)
+
+
+def _new_participant(name: str) -> dict:
+    return {
         "id": str(uuid.uuid4()),
-        "name": request.name,
-        "avatar": generate_avatar_url(request.name),
+        "name": name,
+        "avatar": generate_avatar_url(name),
         "color": generate_color(),
         "isOnline": True,
         "cursor": None,
         "isTyping": False
     }
-    
-    database.add_participant(sessionId, participant_data)
-    return participant_data
 
 
-@router.patch("/{sessionId}/participants/{participantId}", response_model=Participant)
-def update_participant(sessionId: str, participantId: str, request: UpdateParticipantRequest):
+def _check_name_available(session_id: str, name: str) -> None:
+    # Check if participant name already exists in this session
+    if database.participant_exists(session_id, name):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": "Participant with this name already exists", "code": 409}
+        )
+
+
+@router.post(
+    "/{sessionId}/bootstrap",
+    response_model=BootstrapResponse,
+    dependencies=[Depends(rate_limit("presence"))],
+)
+async def bootstrap_session(sessionId: str, request: BootstrapRequest, http_request: Request):
+    """Join a session and return its snapshot, participants and a stream resume token in one call.
+
+    The response is gzip-compressed when the document is large and the client accepts it.
+    """
+    if not database.get_session_metadata(sessionId):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Session not found", "code": 404}
+        )
+
+    # Read spilled code back off the event loop; the actor then finds it resident
+    await database.load_session(sessionId)
+
+    def apply():
+        session = database.get_session(sessionId)
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"error": "Session not found", "code": 404}
+            )
+
+        participant = None
+        if request.participantId:
+            # Rejoining (e.g. after a reload) keeps the existing participant
+            participant = next(
+                (
+                    p for p in database.get_participants(sessionId)
+                    if p["id"] == request.participantId and p["name"] == request.name
+                ),
+                None,
+            )
+        if participant is not None:
+            participant = database.update_participant(sessionId, participant["id"], {"isOnline": True})
+        else:
+            _check_name_available(sessionId, request.name)
+            participant = _new_participant(request.name)
+            database.add_participant(sessionId, participant)
+
+        # Taken inside the actor, so the snapshot and token describe the same state
+        participant_list = database.get_participants(sessionId)
+        return BootstrapResponse(
+            session=session,
+            participant=participant,
+            participants=participant_list,
+            resumeToken=encode_resume_token(session, participant_list),
+        )
+
+    result = await run_in_session(sessionId, apply)
+    body = result.model_dump_json().encode()
+
+    if len(result.session.code) < BOOTSTRAP_COMPRESS_MIN_BYTES or "gzip" not in http_request.headers.get("accept-encoding", ""):
+        return Response(body, media_type="application/json")
+    compressed = await asyncio.to_thread(gzip.compress, body, BOOTSTRAP_GZIP_LEVEL)
+    return Response(
+        compressed,
+        media_type="application/json",
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
+
+
+@router.patch(
+    "/{sessionId}/participants/{participantId}",
+    response_model=Participant,
+    dependencies=[Depends(rate_limit("presence"))],
+)
+async def update_participant(sessionId: str, participantId: str, request: UpdateParticipantRequest):
     """Update participant activity (cursor, typing, online)."""
-    session = database.get_session(sessionId)
-    if not session:
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
         )
 
-    participant = database.update_participant(sessionId, participantId, request.dict())
+    updates = request.dict()
+    participant = await run_in_session(
+        sessionId, lambda: database.update_participant(sessionId, participantId, updates)
+    )
     if not participant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -80,16 +181,17 @@ def update_participant(sessionId: str, participantId: str, request: UpdatePartic
 
 
 @router.delete("/{sessionId}/participants/{participantId}", status_code=status.HTTP_204_NO_CONTENT)
-def leave_session(sessionId: str, participantId: str):
+async def leave_session(sessionId: str, participantId: str):
     """Remove a participant from a session when they leave/close the tab."""
-    session = database.get_session(sessionId)
-    if not session:
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
         )
 
-    removed = database.remove_participant(sessionId, participantId)
+    removed = await run_in_session(
+        sessionId, lambda: database.remove_participant(sessionId, participantId)
+    )
     if not removed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,28 +201,47 @@ def leave_session(sessionId: str, participantId: str):
     return None
 
 
-@router.get("/{sessionId}/participants/stream")
-async def stream_participants(sessionId: str):
-    """Server-sent events stream of participant list for basic real-time updates."""
-    session = database.get_session(sessionId)
-    if not session:
+@router.get("/{sessionId}/participants/stream", dependencies=[Depends(rate_limit("stream"))])
+async def stream_participants(sessionId: str, resume: Optional[str] = None):
+    """Server-sent events stream of participant list for basic real-time updates.
+
+    With a `resume` token from bootstrap, the list is only sent once it differs
+    from the one the client already has.
+    """
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
         )
+    # A resume token from bootstrap means the client already has this list
+    resume_digest = None
+    if resume:
+        try:
+            resume_digest = decode_resume_token(resume)["participants"]
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": "Invalid resume token", "code": 400}
+            )
 
     async def event_generator():
         last_payload = None
         try:
             while True:
-                if not database.get_session(sessionId):
+                if lifecycle.is_draining():
+                    # Server is restarting; tell the client to re-open the stream shortly
+                    yield f"event: reconnect\ndata: {json.dumps({'retryMs': STREAM_RECONNECT_DELAY_MS})}\n\n"
+                    break
+                if sessionId not in database.sessions:
                     break
 
                 participant_list = database.get_participants(sessionId)
                 payload = json.dumps(participant_list)
                 if payload != last_payload:
+                    resumed = last_payload is None and participants_digest(payload) == resume_digest
                     last_payload = payload
-                    yield f"data: {payload}\n\n"
+                    if not resumed:
+                        yield f"data: {payload}\n\n"
                 await asyncio.sleep(2)
         except asyncio.CancelledError:
             # Client disconnected
@@ -2,21 +2,36 @@
 
 import asyncio
 import json
-import uuid
-from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 
-from models import Session, CreateSessionRequest, UpdateCodeRequest, UpdateLanguageRequest
-from config import DEFAULT_CODE, SUPPORTED_LANGUAGES
+from models import (
+    Session,
+    CreateSessionRequest,
+    DiagnosticsResponse,
+    EditCodeRequest,
+    UpdateCodeRequest,
+    UpdateLanguageRequest,
+)
+from config import DEFAULT_CODE, STREAM_RECONNECT_DELAY_MS, SUPPORTED_LANGUAGES
+from services import diagnostics, flow_control, lifecycle
+from services.rate_limiter import rate_limit
+from services.session_actors import run_in_session
+from utils import build_session_data, decode_resume_token
 import database
 
 router = APIRouter(prefix="/v1/sessions", tags=["sessions"])
 
 
-@router.post("", status_code=status.HTTP_201_CREATED, response_model=Session)
-def create_session(request: CreateSessionRequest):
+@router.post(
+    "",
+    status_code=status.HTTP_201_CREATED,
+    response_model=Session,
+    dependencies=[Depends(rate_limit("session_create"))],
+)
+async def create_session(request: CreateSessionRequest):
     """Create a new coding session."""
     try:
         if request.language not in SUPPORTED_LANGUAGES:
@@ -25,18 +40,8 @@ def create_session(request: CreateSessionRequest):
                 detail={"error": f"Unsupported language: {request.language}", "code": 400}
             )
         
-        session_id = str(uuid.uuid4())
-        session_data = {
-            "id": session_id,
-            "title": request.title,
-            "createdAt": datetime.utcnow().isoformat() + "Z",
-            "language": request.language,
-            "code": DEFAULT_CODE[request.language],
-            "version": 0,
-            "lastClientId": None,
-        }
-        
-        database.create_session(session_id, session_data)
+        session_data = build_session_data(request.title, request.language)
+        database.create_session(session_data["id"], session_data)
         return session_data
     except HTTPException:
         raise
@@ -48,9 +53,9 @@ def create_session(request: CreateSessionRequest):
 
 
 @router.get("/{sessionId}", response_model=Session)
-def get_session(sessionId: str):
+async def get_session(sessionId: str):
     """Get session details."""
-    session = database.get_session(sessionId)
+    session = await database.load_session(sessionId)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -59,39 +64,105 @@ def get_session(sessionId: str):
     return session
 
 
-@router.put("/{sessionId}")
-def update_session_code(sessionId: str, request: UpdateCodeRequest):
+@router.put("/{sessionId}", dependencies=[Depends(rate_limit("code"))])
+async def update_session_code(sessionId: str, request: UpdateCodeRequest):
     """Update session code."""
-    session = database.get_session(sessionId)
-    if not session:
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
         )
-    
-    current_version = session.get("version", 0)
 
-    if request.version != current_version:
+    def apply():
+        # Metadata only: a full replace must not rebuild (or reload) the old text
+        metadata = database.get_session_metadata(sessionId)
+        if not metadata:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"error": "Session not found", "code": 404}
+            )
+
+        current_version = metadata["version"]
+
+        if request.version != current_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "error": "Version conflict",
+                    "code": 409,
+                    "codeContent": database.get_session(sessionId).get("code", ""),
+                    "version": current_version,
+                },
+            )
+
+        new_version = current_version + 1
+        database.update_session_code(sessionId, request.code, new_version, request.clientId)
+        return {"version": new_version}
+
+    result = await run_in_session(sessionId, apply)
+    diagnostics.schedule(sessionId)
+    return result
+
+
+@router.patch("/{sessionId}", dependencies=[Depends(rate_limit("code"))])
+async def edit_session_code(sessionId: str, request: EditCodeRequest):
+    """Apply range edits to session code without resending the whole document."""
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={
-                "error": "Version conflict",
-                "code": 409,
-                "codeContent": session.get("code", ""),
-                "version": current_version,
-            },
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Session not found", "code": 404}
         )
+    # Edits are applied to the in-memory document, so read spilled code back off the event loop first
+    await database.ensure_loaded(sessionId)
+
+    def apply():
+        metadata = database.get_session_metadata(sessionId)
+        if not metadata:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"error": "Session not found", "code": 404}
+            )
+
+        current_version = metadata["version"]
+
+        if request.version != current_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "error": "Version conflict",
+                    "code": 409,
+                    "codeContent": database.get_session(sessionId).get("code", ""),
+                    "version": current_version,
+                },
+            )
+
+        edits = [
+            (
+                (edit.start.lineNumber, edit.start.column),
+                (edit.end.lineNumber, edit.end.column),
+                edit.text,
+            )
+            for edit in request.edits
+        ]
+        new_version = current_version + 1
+        try:
+            database.apply_session_edits(sessionId, edits, new_version, request.clientId)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": str(e), "code": 400}
+            )
+        return {"version": new_version}
 
-    new_version = current_version + 1
-    database.update_session_code(sessionId, request.code, new_version, request.clientId)
-    return {"version": new_version}
+    result = await run_in_session(sessionId, apply)
+    diagnostics.schedule(sessionId)
+    return result
 
 
-@router.put("/{sessionId}/language")
-def update_session_language(sessionId: str, request: UpdateLanguageRequest):
+@router.put("/{sessionId}/language", dependencies=[Depends(rate_limit("code"))])
+async def update_session_language(sessionId: str, request: UpdateLanguageRequest):
     """Update session language."""
-    session = database.get_session(sessionId)
-    if not session:
+    if not database.get_session_metadata(sessionId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
@@ -104,42 +175,145 @@ def update_session_language(sessionId: str, request: UpdateLanguageRequest):
         )
     
     new_code = DEFAULT_CODE[request.language]
-    current_version = session.get("version", 0)
-    new_version = current_version + 1
 
-    database.update_session_language(sessionId, request.language, new_code, new_version, "server-language-change")
-    
-    return {"code": new_code, "version": new_version}
+    def apply():
+        metadata = database.get_session_metadata(sessionId)
+        if not metadata:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"error": "Session not found", "code": 404}
+            )
 
+        new_version = metadata["version"] + 1
+        database.update_session_language(sessionId, request.language, new_code, new_version, "server-language-change")
+        return {"code": new_code, "version": new_version}
 
-@router.get("/{sessionId}/stream")
-async def stream_session(sessionId: str):
-    """Server-sent events stream for session code/language changes."""
-    session = database.get_session(sessionId)
-    if not session:
+    result = await run_in_session(sessionId, apply)
+    diagnostics.schedule(sessionId)
+    return result
+
+
+@router.get("/{sessionId}/diagnostics", response_model=DiagnosticsResponse)
+async def get_session_diagnostics(sessionId: str):
+    """Get cached syntax diagnostics and outline for the current code version."""
+    metadata = database.get_session_metadata(sessionId)
+    if not metadata:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": "Session not found", "code": 404}
         )
 
+    cached = diagnostics.get_cached(sessionId)
+    if cached and cached["version"] == metadata["version"] and cached["language"] == metadata["language"]:
+        return cached
+
+    if sessionId not in diagnostics.pending:
+        diagnostics.schedule(sessionId)
+    return {
+        "version": metadata["version"],
+        "language": metadata["language"],
+        "status": "pending",
+        "diagnostics": [],
+        "outline": [],
+    }
+
+
+def build_stream_event(session: dict) -> str:
+    """Build the SSE message sent to session stream subscribers."""
+    payload = json.dumps({
+        "code": session.get("code", ""),
+        "language": session.get("language", "javascript"),
+        "version": session.get("version", 0),
+        "sourceClientId": session.get("lastClientId"),
+    })
+    return f"data: {payload}\n\n"
+
+
+def build_edits_event(version: int, client_id: Optional[str], edits: list) -> str:
+    """Build the SSE `edits` event: the range edits that turned version - 1 into `version`.
+
+    Edits are applied in order, each positioned in the text left by the previous one.
+    """
+    payload = json.dumps({
+        "version": version,
+        "baseVersion": version - 1,
+        "sourceClientId": client_id,
+        "edits": [
+            {
+                "start": {"lineNumber": start[0], "column": start[1]},
+                "end": {"lineNumber": end[0], "column": end[1]},
+                "text": text,
+            }
+            for start, end, text in edits
+        ],
+    })
+    return f"event: edits\ndata: {payload}\n\n"
+
+
+@router.get("/{sessionId}/stream", dependencies=[Depends(rate_limit("stream"))])
+async def stream_session(sessionId: str, resume: Optional[str] = None):
+    """Server-sent events stream for session code/language changes, diagnostics and flow control."""
+    if not database.get_session_metadata(sessionId):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "Session not found", "code": 404}
+        )
+
+    # A resume token from bootstrap means the client already has this state
+    resumed_state = None
+    if resume:
+        try:
+            token = decode_resume_token(resume)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": "Invalid resume token", "code": 400}
+            )
+        resumed_state = (token["version"], token["language"], token["lastClientId"])
+
     async def event_generator():
-        last_payload = None
+        last_state = resumed_state
+        last_diagnostics = None
+        last_flow = None
         try:
             while True:
-                current_session = database.get_session(sessionId)
-                if not current_session:
+                if lifecycle.is_draining():
+                    # Server is restarting; tell the client to re-open the stream shortly
+                    yield f"event: reconnect\ndata: {json.dumps({'retryMs': STREAM_RECONNECT_DELAY_MS})}\n\n"
+                    break
+                metadata = database.get_session_metadata(sessionId)
+                if not metadata:
                     break
 
-                payload = json.dumps({
-                    "code": current_session.get("code", ""),
-                    "language": current_session.get("language", "javascript"),
-                    "version": current_session.get("version", 0),
-                    "sourceClientId": current_session.get("lastClientId"),
-                })
+                # Compare metadata only, so idle documents are neither re-serialized
+                # every tick nor pulled back into memory after being spilled
+                state = (metadata["version"], metadata["language"], metadata["lastClientId"])
+                if state != last_state:
+                    # Send the range edits since the last version sent when they are still
+                    # logged, so live rooms never rebuild the whole document per version
+                    logged = None
+                    if last_state is not None and last_state[1] == metadata["language"]:
+                        logged = database.get_edits_since(sessionId, last_state[0])
+                    last_state = state
+                    if logged is not None:
+                        for version, client_id, edits in logged:
+                            yield build_edits_event(version, client_id, edits)
+                    else:
+                        session = await database.load_session(sessionId)
+                        if not session:
+                            break
+                        yield build_stream_event(session)
+
+                cached = diagnostics.get_cached(sessionId)
+                if cached and cached is not last_diagnostics and cached["version"] == metadata["version"]:
+                    last_diagnostics = cached
+                    yield cached["event"]
 
-                if payload != last_payload:
-                    last_payload = payload
-                    yield f"data: {payload}\n\n"
+                # Recommended send intervals change in coarse steps, so this is rare
+                flow = flow_control.recommend(sessionId)
+                if flow != last_flow:
+                    last_flow = flow
+                    yield f"event: flow\ndata: {json.dumps(flow)}\n\n"
 
                 await asyncio.sleep(1)
         except asyncio.CancelledError:
@@ -0,0 +1,220 @@
+"""Server-side syntax diagnostics and outline, computed once per document version.
+
+After an accepted update the session is parsed in the background (debounced,
+with stale parses cancelled) by the parser registered for its language. The
+result is cached per session, keyed by version, and shared by every
+subscriber of the session stream.
+"""
+
+import ast
+import asyncio
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from config import DIAGNOSTICS_DEBOUNCE_SECONDS, DIAGNOSTICS_MAX_CODE_LENGTH
+import database
+
+Parser = Callable[[str], Dict[str, List[Dict[str, Any]]]]
+
+PARSERS: Dict[str, Parser] = {}
+
+# session_id -> {"version", "language", "status", "diagnostics", "outline", "event"}
+cache: Dict[str, Dict[str, Any]] = {}
+pending: Dict[str, asyncio.Task] = {}
+
+
+def register_parser(language: str, parser: Parser) -> None:
+    """Register (or replace) the parser used for `language`.
+
+    A parser takes the document text and returns {"diagnostics": [...], "outline": [...]}.
+    It runs in a worker thread, so it may block.
+    """
+    PARSERS[language] = parser
+
+
+def _python_outline(nodes: List[ast.stmt]) -> List[Dict[str, Any]]:
+    outline = []
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            outline.append({
+                "name": node.name,
+                "kind": "class" if isinstance(node, ast.ClassDef) else "function",
+                "line": node.lineno,
+                "endLine": node.end_lineno,
+                "children": _python_outline(node.body),
+            })
+    return outline
+
+
+def parse_python(code: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Syntax errors and class/function outline via the stdlib `ast` module."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as exc:
+        return {
+            "diagnostics": [{
+                "severity": "error",
+                "message": exc.msg,
+                "line": exc.lineno or 1,
+                "column": exc.offset or 1,
+            }],
+            "outline": [],
+        }
+    return {"diagnostics": [], "outline": _python_outline(tree.body)}
+
+
+_BRACKETS = {")": "(", "]": "[", "}": "{"}
+_JS_TOKEN = re.compile(
+    r"//[^\n]*|/\*.*?\*/|'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\"|`(?:\\.|[^`\\])*`"
+    # Regex literal (only taken as one after an operator or keyword, see _starts_regex)
+    r"|/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\[\n])+/[A-Za-z]*"
+    r"|[()\[\]{}]|\n",
+    re.S,
+)
+_JS_DECLARATION = re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(function\*?|class|interface)\s+([A-Za-z_$][\w$]*)", re.M)
+_JS_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else", "yield", "await"}
+
+
+def _is_identifier_char(char: str) -> bool:
+    return char.isalnum() or char in "_$"
+
+
+def _starts_regex(code: str, position: int) -> bool:
+    """Whether a "/" at `position` starts a regex literal rather than a division."""
+    end = position - 1
+    while end >= 0 and code[end] in " \t\r\n":
+        end -= 1
+    if end < 0:
+        return True
+    if code[end] in ")]":
+        return False
+    if not _is_identifier_char(code[end]):
+        return True
+    start = end
+    while start > 0 and _is_identifier_char(code[start - 1]):
+        start -= 1
+    return code[start:end + 1] in _JS_REGEX_KEYWORDS
+
+
+def parse_javascript(code: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Default JS/TS hook: unbalanced brackets and top-level declarations.
+
+    This is deliberately lightweight; register a real parser for full linting.
+    """
+    diagnostics = []
+    stack = []
+    line = 1
+    line_start = 0
+    position = 0
+    while True:
+        match = _JS_TOKEN.search(code, position)
+        if match is None:
+            break
+        token = match.group()
+        position = match.end()
+        if token[0] == "/" and token[:2] not in ("//", "/*") and not _starts_regex(code, match.start()):
+            # A division operator: rescan just after it
+            position = match.start() + 1
+            continue
+        column = match.start() - line_start + 1
+        if token in "([{":
+            stack.append((token, line, column))
+        elif token in _BRACKETS:
+            if stack and stack[-1][0] == _BRACKETS[token]:
+                stack.pop()
+            else:
+                diagnostics.append({"severity": "error", "message": f"Unexpected '{token}'", "line": line, "column": column})
+        newlines = token.count("\n")
+        if newlines:
+            line += newlines
+            line_start = match.start() + token.rfind("\n") + 1
+    for token, opened_at, column in stack:
+        diagnostics.append({"severity": "error", "message": f"Unclosed '{token}'", "line": opened_at, "column": column})
+
+    outline = [
+        {
+            "name": match.group(2),
+            "kind": "class" if match.group(1) in ("class", "interface") else "function",
+            "line": code.count("\n", 0, match.start()) + 1,
+            "endLine": None,
+            "children": [],
+        }
+        for match in _JS_DECLARATION.finditer(code)
+    ]
+    return {"diagnostics": diagnostics, "outline": outline}
+
+
+register_parser("python", parse_python)
+register_parser("javascript", parse_javascript)
+register_parser("typescript", parse_javascript)
+
+
+def get_cached(session_id: str) -> Optional[Dict[str, Any]]:
+    return cache.get(session_id)
+
+
+def schedule(session_id: str) -> None:
+    """(Re)start the debounced parse for a session, cancelling any stale one."""
+    task = pending.pop(session_id, None)
+    if task:
+        task.cancel()
+    pending[session_id] = asyncio.create_task(_parse_after_debounce(session_id))
+
+
+async def _parse_after_debounce(session_id: str) -> None:
+    try:
+        await asyncio.sleep(DIAGNOSTICS_DEBOUNCE_SECONDS)
+        metadata = database.get_session_metadata(session_id)
+        if not metadata:
+            return
+        version = metadata["version"]
+        language = metadata["language"]
+        cached = cache.get(session_id)
+        if cached and cached["version"] == version and cached["language"] == language:
+            return
+        parser = PARSERS.get(language)
+        if parser is None or metadata["codeLength"] > DIAGNOSTICS_MAX_CODE_LENGTH:
+            # Cached too, so polls see a final status instead of re-scheduling this forever
+            _store(session_id, {"version": version, "language": language, "status": "skipped", "diagnostics": [], "outline": []})
+            return
+
+        # Built off the event loop, without keeping a flat copy of the document in memory
+        code = await database.read_code(session_id)
+        current = database.get_session_metadata(session_id)
+        if code is None or not current or current["version"] != version:
+            # Changed while reading; the update that changed it scheduled its own parse
+            return
+
+        try:
+            result = await asyncio.to_thread(parser, code)
+        except Exception as exc:
+            # e.g. RecursionError/MemoryError on pathological input: cache a result anyway so
+            # the document is not re-parsed on every poll until it changes
+            result = {
+                "diagnostics": [{
+                    "severity": "error",
+                    "message": f"Could not analyze this document ({type(exc).__name__})",
+                    "line": 1,
+                    "column": 1,
+                }],
+                "outline": [],
+            }
+        _store(session_id, {"version": version, "language": language, "status": "ready", **result})
+    finally:
+        if pending.get(session_id) is asyncio.current_task():
+            pending.pop(session_id, None)
+
+
+def _store(session_id: str, entry: Dict[str, Any]) -> None:
+    # Serialized once here and reused for every stream subscriber
+    entry["event"] = f"event: diagnostics\ndata: {json.dumps(entry)}\n\n"
+    cache[session_id] = entry
+
+
+def forget(session_id: str) -> None:
+    """Drop cached results and any in-flight parse for a deleted session."""
+    cache.pop(session_id, None)
+    task = pending.pop(session_id, None)
+    if task:
+        task.cancel()
@@ -0,0 +1,354 @@
+"""Rope-backed text document with a line index.
+
+The text is stored as a height-balanced (AVL) binary tree of string leaves.
+Every node caches its length, newline count and memory size; the newline
+counts double as the line start index: insert/delete, offset <-> (line, column)
+conversion and slicing are O(log n) (plus the size of the inserted/sliced
+text), and the flat string is only built when `text()` is called. Nodes are
+never mutated in place, so `copy()` is O(1) and a copy can be read from
+another thread while the original keeps changing.
+
+Positions follow the editor's `CursorPosition`: 1-based line numbers and
+columns, with columns counted in characters.
+"""
+
+import sys
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+LEAF_SIZE = 1024
+
+
+class _Leaf:
+    __slots__ = ("text", "length", "newlines", "size", "height")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.newlines = text.count("\n")
+        self.size = sys.getsizeof(text)
+        self.height = 0
+
+
+class _Node:
+    __slots__ = ("left", "right", "length", "newlines", "size", "height")
+
+    def __init__(self, left: "_Tree", right: "_Tree"):
+        self.left = left
+        self.right = right
+        self.length = left.length + right.length
+        self.newlines = left.newlines + right.newlines
+        self.size = left.size + right.size
+        self.height = 1 + max(left.height, right.height)
+
+
+_Tree = Union[_Leaf, _Node]
+
+
+def _build(text: str) -> Optional[_Tree]:
+    """Balanced tree of evenly sized leaves (none larger than LEAF_SIZE)."""
+    if not text:
+        return None
+    count = -(-len(text) // LEAF_SIZE)
+    bounds = [len(text) * i // count for i in range(count + 1)]
+
+    def build(first: int, last: int) -> _Tree:
+        if first == last:
+            return _Leaf(text[bounds[first]:bounds[first + 1]])
+        middle = (first + last) // 2
+        return _Node(build(first, middle), build(middle + 1, last))
+
+    return build(0, count - 1)
+
+
+def _rotate_left(node: _Node) -> _Node:
+    right = node.right
+    return _Node(_Node(node.left, right.left), right.right)
+
+
+def _rotate_right(node: _Node) -> _Node:
+    left = node.left
+    return _Node(left.left, _Node(left.right, node.right))
+
+
+def _join_right(left: _Node, right: _Tree) -> _Tree:
+    """Join when `left` is more than one level taller: descend its right spine."""
+    inner = left.right
+    if inner.height <= right.height + 1:
+        joined = _Node(inner, right)
+        if joined.height <= left.left.height + 1:
+            return _Node(left.left, joined)
+        return _rotate_left(_Node(left.left, _rotate_right(joined)))
+    joined = _join_right(inner, right)
+    if joined.height <= left.left.height + 1:
+        return _Node(left.left, joined)
+    return _rotate_left(_Node(left.left, joined))
+
+
+def _join_left(left: _Tree, right: _Node) -> _Tree:
+    """Mirror image of _join_right."""
+    inner = right.left
+    if inner.height <= left.height + 1:
+        joined = _Node(left, inner)
+        if joined.height <= right.right.height + 1:
+            return _Node(joined, right.right)
+        return _rotate_right(_Node(_rotate_left(joined), right.right))
+    joined = _join_left(left, inner)
+    if joined.height <= right.right.height + 1:
+        return _Node(joined, right.right)
+    return _rotate_right(_Node(joined, right.right))
+
+
+def _join(left: Optional[_Tree], right: Optional[_Tree]) -> Optional[_Tree]:
+    """Concatenate two trees in O(height difference), keeping AVL balance."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.height > right.height + 1:
+        return _join_right(left, right)
+    if right.height > left.height + 1:
+        return _join_left(left, right)
+    # Merging is only safe here: inside a spine it would shrink a subtree's height
+    if isinstance(left, _Leaf) and isinstance(right, _Leaf) and left.length + right.length <= LEAF_SIZE:
+        return _Leaf(left.text + right.text)
+    return _Node(left, right)
+
+
+def _split(node: Optional[_Tree], offset: int) -> Tuple[Optional[_Tree], Optional[_Tree]]:
+    """Split into the first `offset` characters and the rest."""
+    if node is None:
+        return None, None
+    if offset <= 0:
+        return None, node
+    if offset >= node.length:
+        return node, None
+    if isinstance(node, _Leaf):
+        return _Leaf(node.text[:offset]), _Leaf(node.text[offset:])
+    if offset <= node.left.length:
+        left, rest = _split(node.left, offset)
+        return left, _join(rest, node.right)
+    rest, right = _split(node.right, offset - node.left.length)
+    return _join(node.left, rest), right
+
+
+def _edge_leaf(node: _Tree, last: bool) -> _Leaf:
+    while isinstance(node, _Node):
+        node = node.right if last else node.left
+    return node
+
+
+def _join_merging(left: Optional[_Tree], right: Optional[_Tree]) -> Optional[_Tree]:
+    """Join, re-chunking the two leaves that meet so edits don't leave slivers behind."""
+    if left is None or right is None:
+        return left if right is None else right
+    tail = _edge_leaf(left, last=True).text
+    head = _edge_leaf(right, last=False).text
+    left, _ = _split(left, left.length - len(tail))
+    _, right = _split(right, len(head))
+    return _join(_join(left, _build(tail + head)), right)
+
+
+def _leaves(node: Optional[_Tree], reverse: bool = False) -> Iterator[_Leaf]:
+    """Leaves in document order (or reversed)."""
+    stack = [node] if node else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _Leaf):
+            yield node
+        elif reverse:
+            stack.append(node.left)
+            stack.append(node.right)
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+
+
+def _common_length(a: str, b: str, reverse: bool = False) -> int:
+    """Length of the common prefix (or suffix) of two strings."""
+    count = min(len(a), len(b))
+    for i in range(count):
+        if (a[-1 - i] != b[-1 - i]) if reverse else (a[i] != b[i]):
+            return i
+    return count
+
+
+def _insert(node: Optional[_Tree], offset: int, text: str) -> Optional[_Tree]:
+    if node is None:
+        return _build(text)
+    if isinstance(node, _Leaf):
+        return _build(node.text[:offset] + text + node.text[offset:])
+    if offset <= node.left.length:
+        return _join(_insert(node.left, offset, text), node.right)
+    return _join(node.left, _insert(node.right, offset - node.left.length, text))
+
+
+class Document:
+    """Mutable text document backed by a rope; see the module docstring."""
+
+    def __init__(self, text: str = ""):
+        self._root = _build(text)
+        self._text: Optional[str] = text
+
+    def __len__(self) -> int:
+        return self._root.length if self._root else 0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held (as sys.getsizeof): the leaves plus the cached flat text."""
+        size = self._root.size if self._root else 0
+        return size + (sys.getsizeof(self._text) if self._text is not None else 0)
+
+    def copy(self) -> "Document":
+        """An independent document with the same text, sharing all nodes (O(1))."""
+        clone = Document.__new__(Document)
+        clone._root, clone._text = self._root, self._text
+        return clone
+
+    @property
+    def line_count(self) -> int:
+        return (self._root.newlines if self._root else 0) + 1
+
+    def text(self) -> str:
+        """The full text; built once and cached until the next edit."""
+        if self._text is None:
+            self._text = "".join(leaf.text for leaf in _leaves(self._root))
+        return self._text
+
+    def _check_range(self, start: int, end: int) -> None:
+        if not 0 <= start <= end <= len(self):
+            raise ValueError(f"Range {start}..{end} is outside the document (length {len(self)})")
+
+    def insert(self, offset: int, text: str) -> None:
+        self._check_range(offset, offset)
+        if text:
+            self._root = _insert(self._root, offset, text)
+            self._text = None
+
+    def delete(self, start: int, end: int) -> None:
+        self._check_range(start, end)
+        if start < end:
+            left, rest = _split(self._root, start)
+            _, right = _split(rest, end - start)
+            self._root = _join_merging(left, right)
+            self._text = None
+
+    def replace(self, start: int, end: int, text: str) -> None:
+        self.delete(start, end)
+        self.insert(start, text)
+
+    def apply_edits(self, edits: Iterable[Tuple[Tuple[int, int], Tuple[int, int], str]]) -> None:
+        """Apply ((line, column), (line, column), text) range replacements in order, atomically.
+
+        Each edit's positions refer to the document as left by the previous edit.
+        If any edit is out of range nothing is changed and ValueError is raised.
+        """
+        root, text = self._root, self._text
+        try:
+            for (start_line, start_column), (end_line, end_column), new_text in edits:
+                start = self.position_to_offset(start_line, start_column)
+                end = self.position_to_offset(end_line, end_column)
+                if end < start:
+                    raise ValueError("Edit range ends before it starts")
+                self.replace(start, end, new_text)
+        except ValueError:
+            # Nodes are never mutated in place, so the old root is still intact
+            self._root, self._text = root, text
+            raise
+
+    def set_text(self, text: str) -> Optional[Tuple[Tuple[int, int], Tuple[int, int], str]]:
+        """Replace the whole text by editing only the range that differs.
+
+        The common prefix and suffix are found by comparing leaves against
+        `text`, without building the current flat text. Returns the applied
+        ((line, column), (line, column), text) edit, positioned in the old
+        text, or None if the text is unchanged.
+        """
+        prefix = 0
+        for leaf in _leaves(self._root):
+            # Whole leaves are compared in place; only the first differing one is copied
+            if text.startswith(leaf.text, prefix):
+                prefix += leaf.length
+                continue
+            prefix += _common_length(leaf.text, text[prefix:prefix + leaf.length])
+            break
+        length = len(self)
+        limit = min(length, len(text)) - prefix
+        suffix = 0
+        for leaf in _leaves(self._root, reverse=True):
+            if suffix >= limit:
+                break
+            end = len(text) - suffix
+            if text.endswith(leaf.text, 0, end):
+                suffix += leaf.length
+                continue
+            suffix += _common_length(leaf.text, text[max(end - leaf.length, 0):end], reverse=True)
+            break
+        suffix = min(suffix, limit)
+
+        start, end = prefix, length - suffix
+        new_text = text[prefix:len(text) - suffix]
+        if start == end and not new_text:
+            return None
+        edit = (self.offset_to_position(start), self.offset_to_position(end), new_text)
+        self.replace(start, end, new_text)
+        return edit
+
+    def slice(self, start: int, end: int) -> str:
+        self._check_range(start, end)
+        parts = []
+        stack = [(self._root, 0)] if self._root and start < end else []
+        while stack:
+            node, node_start = stack.pop()
+            node_end = node_start + node.length
+            if node_end <= start or node_start >= end:
+                continue
+            if isinstance(node, _Leaf):
+                parts.append(node.text[max(start - node_start, 0):end - node_start])
+            else:
+                stack.append((node.right, node_start + node.left.length))
+                stack.append((node.left, node_start))
+        return "".join(parts)
+
+    def _newline_offset(self, n: int) -> int:
+        """Offset of the n-th (1-based) newline character."""
+        node, base = self._root, 0
+        while isinstance(node, _Node):
+            if n <= node.left.newlines:
+                node = node.left
+            else:
+                n -= node.left.newlines
+                base += node.left.length
+                node = node.right
+        position = -1
+        for _ in range(n):
+            position = node.text.index("\n", position + 1)
+        return base + position
+
+    def _line_start(self, line: int) -> int:
+        return 0 if line == 1 else self._newline_offset(line - 1) + 1
+
+    def offset_to_position(self, offset: int) -> Tuple[int, int]:
+        """Convert a character offset to a 1-based (lineNumber, column)."""
+        self._check_range(offset, offset)
+        node, remaining, newlines = self._root, offset, 0
+        while isinstance(node, _Node):
+            if remaining <= node.left.length:
+                node = node.left
+            else:
+                remaining -= node.left.length
+                newlines += node.left.newlines
+                node = node.right
+        if node is not None:
+            newlines += node.text.count("\n", 0, remaining)
+        line = newlines + 1
+        return line, offset - self._line_start(line) + 1
+
+    def position_to_offset(self, line: int, column: int) -> int:
+        """Convert a 1-based (lineNumber, column) to a character offset."""
+        if not 1 <= line <= self.line_count:
+            raise ValueError(f"Line {line} is outside the document ({self.line_count} lines)")
+        start = self._line_start(line)
+        end = self._newline_offset(line) if line < self.line_count else len(self)
+        if not 1 <= column <= end - start + 1:
+            raise ValueError(f"Column {column} is outside line {line} ({end - start} characters)")
+        return start + column - 1
@@ -0,0 +1,75 @@
+"""Server-recommended client send intervals (adaptive flow control).
+
+Clients debounce code updates and throttle cursor updates. Instead of fixed
+constants, the server recommends both intervals from what it can observe:
+
+- load on the global write budget and on the session's own rate-limit buckets,
+- the depth of the session actor's mailbox (mutations waiting to be applied),
+- for cursors, the number of participants each update is fanned out to.
+
+Intervals grow smoothly with pressure, so clients slow down before they start
+hitting 429s. Recommendations are sent as response headers and as `flow`
+events on the session stream.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from config import (
+    FLOW_CODE_DEBOUNCE_MS,
+    FLOW_CURSOR_FREE_PARTICIPANTS,
+    FLOW_CURSOR_THROTTLE_MS,
+    FLOW_INTERVAL_STEP_MS,
+    FLOW_LOAD_THRESHOLD,
+    FLOW_MAX_LOAD_FACTOR,
+    FLOW_QUEUE_DEPTH_SCALE,
+)
+import database
+from services import session_actors
+from services.rate_limiter import limiter
+
+CODE_DEBOUNCE_HEADER = "X-Code-Debounce-Ms"
+CURSOR_THROTTLE_HEADER = "X-Cursor-Throttle-Ms"
+
+
+def _load_factor(load: float) -> float:
+    """1.0 up to FLOW_LOAD_THRESHOLD, rising linearly to 1 + FLOW_MAX_LOAD_FACTOR at full load."""
+    excess = max(0.0, load - FLOW_LOAD_THRESHOLD) / (1.0 - FLOW_LOAD_THRESHOLD)
+    return 1.0 + FLOW_MAX_LOAD_FACTOR * min(excess, 1.0)
+
+
+def _interval(limits: Tuple[int, int], factor: float) -> int:
+    base, maximum = limits
+    stepped = round(base * factor / FLOW_INTERVAL_STEP_MS) * FLOW_INTERVAL_STEP_MS
+    return int(min(maximum, max(base, stepped)))
+
+
+def recommend(session_id: Optional[str] = None) -> Dict[str, int]:
+    """Recommended {"codeDebounceMs", "cursorThrottleMs"}; global if no session is given."""
+    global_load = limiter.global_load()
+    code_factor = _load_factor(global_load)
+    cursor_factor = code_factor
+
+    if session_id is not None and session_id in database.sessions:
+        code_factor = _load_factor(max(global_load, limiter.session_load("code", session_id)))
+        cursor_factor = _load_factor(max(global_load, limiter.session_load("presence", session_id)))
+
+        actor = session_actors.actors.get(session_id)
+        queue_factor = 1.0 + (actor.queue_depth if actor else 0) / FLOW_QUEUE_DEPTH_SCALE
+        code_factor *= queue_factor
+        cursor_factor *= queue_factor
+
+        participant_count = len(database.participants.get(session_id, []))
+        cursor_factor *= max(1.0, participant_count / FLOW_CURSOR_FREE_PARTICIPANTS)
+
+    return {
+        "codeDebounceMs": _interval(FLOW_CODE_DEBOUNCE_MS, code_factor),
+        "cursorThrottleMs": _interval(FLOW_CURSOR_THROTTLE_MS, cursor_factor),
+    }
+
+
+def headers(session_id: Optional[str] = None) -> Dict[str, str]:
+    flow = recommend(session_id)
+    return {
+        CODE_DEBOUNCE_HEADER: str(flow["codeDebounceMs"]),
+        CURSOR_THROTTLE_HEADER: str(flow["cursorThrottleMs"]),
+    }
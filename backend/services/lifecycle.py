@@ -0,0 +1,13 @@
+"""Process lifecycle state shared by the app and its event streams."""
+
+_draining = False
+
+
+def begin_drain() -> None:
+    """Stop accepting new work and ask open streams to reconnect elsewhere/later."""
+    global _draining
+    _draining = True
+
+
+def is_draining() -> bool:
+    return _draining
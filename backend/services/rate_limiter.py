@@ -0,0 +1,149 @@
+"""Token-bucket admission control and load shedding for write endpoints."""
+
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from config import (
+    GLOBAL_WRITE_LIMIT,
+    RATE_LIMITS,
+    RATE_LIMIT_BUCKET_IDLE_TTL,
+    SHED_PRIORITY_RESERVE,
+)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float, reserve: float = 0.0, cost: int = 1) -> float:
+        """Seconds until `cost` tokens are available above `reserve` (0 if available now)."""
+        self.refill(now)
+        missing = (cost + reserve) - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else float("inf")
+
+    def consume(self, cost: int = 1) -> None:
+        self.tokens -= cost
+
+    @property
+    def fill_ratio(self) -> float:
+        return self.tokens / self.capacity if self.capacity else 0.0
+
+
+class RateLimiter:
+    """Per-client, per-session and global token buckets keyed by request kind.
+
+    Every kind draws from the shared global bucket, but lower-priority kinds
+    must leave a reserve of tokens behind (see SHED_PRIORITY_RESERVE), so under
+    overload cursor/presence traffic is shed before code edits are.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        rate, burst = GLOBAL_WRITE_LIMIT
+        self._global = TokenBucket(rate, burst, time.monotonic())
+
+    def _bucket(self, kind: str, scope: str, key: str, now: float) -> Optional[TokenBucket]:
+        limit = RATE_LIMITS.get(kind, {}).get(scope)
+        if not limit:
+            return None
+        bucket_key = (kind, scope, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            rate, burst = limit
+            bucket = TokenBucket(rate, burst, now)
+            self._buckets[bucket_key] = bucket
+        return bucket
+
+    def acquire(self, kind: str, client_key: str, session_id: Optional[str] = None, cost: int = 1) -> float:
+        """Admit one request of `kind` costing `cost` tokens; return 0 if admitted, else seconds to retry after."""
+        now = time.monotonic()
+        candidates = [self._bucket(kind, "per_client", client_key, now)]
+        if session_id:
+            candidates.append(self._bucket(kind, "per_session", session_id, now))
+        buckets = [b for b in candidates if b is not None]
+
+        reserve = SHED_PRIORITY_RESERVE.get(kind, 0.0) * self._global.capacity
+        retry_after = max(
+            [b.wait_time(now, cost=cost) for b in buckets] + [self._global.wait_time(now, reserve, cost)]
+        )
+        if retry_after > 0:
+            return retry_after
+
+        for bucket in buckets:
+            bucket.consume(cost)
+        self._global.consume(cost)
+        return 0.0
+
+    def global_load(self) -> float:
+        """Fraction of the global write budget currently in use (0.0 idle, 1.0 saturated)."""
+        self._global.refill(time.monotonic())
+        return max(0.0, 1.0 - self._global.fill_ratio)
+
+    def session_load(self, kind: str, session_id: str) -> float:
+        """Like global_load, for the `kind` per-session bucket (0.0 if it has none yet)."""
+        bucket = self._buckets.get((kind, "per_session", session_id))
+        if bucket is None:
+            return 0.0
+        bucket.refill(time.monotonic())
+        return max(0.0, 1.0 - bucket.fill_ratio)
+
+    def prune(self) -> None:
+        """Drop buckets that have been idle long enough to be full again."""
+        cutoff = time.monotonic() - RATE_LIMIT_BUCKET_IDLE_TTL
+        for key in [k for k, b in self._buckets.items() if b.updated_at < cutoff]:
+            self._buckets.pop(key, None)
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop per-session buckets for a deleted session."""
+        for key in [k for k in self._buckets if k[1] == "per_session" and k[2] == session_id]:
+            self._buckets.pop(key, None)
+
+
+limiter = RateLimiter()
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller; nginx sets X-Real-IP when proxying /api/."""
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+    return request.client.host if request.client else "unknown"
+
+
+def enforce_rate_limit(kind: str, request: Request, cost: int = 1) -> None:
+    """Charge `cost` tokens of `kind` for this request or raise 429."""
+    session_id = request.path_params.get("sessionId")
+    retry_after = limiter.acquire(kind, client_key(request), session_id, cost)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={"error": "Too many requests", "code": 429},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def rate_limit(kind: str):
+    """Build a route dependency that enforces the `kind` limits or raises 429."""
+
+    async def dependency(request: Request) -> None:
+        enforce_rate_limit(kind, request)
+
+    return dependency
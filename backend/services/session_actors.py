@@ -0,0 +1,78 @@
+"""Per-session actors that apply mutations in order on the event loop."""
+
+import asyncio
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class SessionActor:
+    """A task with a mailbox that owns all mutations of one session.
+
+    Messages are plain callables; each runs to completion before the next one
+    is taken, so read-check-write sequences (e.g. the version check on code
+    updates) cannot interleave with other writes to the same session.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.mailbox: "asyncio.Queue[Tuple[Optional[Callable[[], Any]], Optional[asyncio.Future]]]" = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(), name=f"session-actor-{session_id}")
+
+    async def _run(self) -> None:
+        while True:
+            fn, future = await self.mailbox.get()
+            if fn is None:
+                return
+            # The caller went away (e.g. client disconnected) before we got to it
+            if future.cancelled():
+                continue
+            try:
+                result = fn()
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    async def call(self, fn: Callable[[], Any]) -> Any:
+        """Queue `fn` behind earlier mutations and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self.mailbox.put_nowait((fn, future))
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self.mailbox.qsize()
+
+    async def stop(self) -> None:
+        """Finish queued messages, then exit."""
+        self.mailbox.put_nowait((None, None))
+        await self.task
+
+
+actors: Dict[str, SessionActor] = {}
+
+
+def get_actor(session_id: str) -> SessionActor:
+    """Return the actor for a session, starting it on first use."""
+    actor = actors.get(session_id)
+    if actor is None:
+        actor = SessionActor(session_id)
+        actors[session_id] = actor
+    return actor
+
+
+async def run_in_session(session_id: str, fn: Callable[[], Any]) -> Any:
+    """Apply `fn` through the session's actor, in arrival order."""
+    return await get_actor(session_id).call(fn)
+
+
+async def stop_actor(session_id: str) -> None:
+    """Stop and forget the actor for a deleted session."""
+    actor = actors.pop(session_id, None)
+    if actor:
+        await actor.stop()
+
+
+async def stop_all() -> None:
+    """Stop every actor, e.g. on application shutdown."""
+    for session_id in list(actors):
+        await stop_actor(session_id)
@@ -0,0 +1,56 @@
+"""Snapshot of in-memory state for warm restarts."""
+
+import gzip
+import json
+import os
+import time
+from typing import Optional
+
+import database
+
+SNAPSHOT_FORMAT = 1
+
+
+def write_snapshot(path: str) -> int:
+    """Atomically write all sessions and participants to `path`; return the session count."""
+    payload = {
+        "format": SNAPSHOT_FORMAT,
+        "savedAt": time.time(),
+        # Spilled documents are read back from disk so the snapshot is self-contained
+        "sessions": {session_id: database.peek_session(session_id) for session_id in database.sessions},
+        "participants": database.participants,
+    }
+    data = json.dumps(payload, separators=(",", ":")).encode()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    # Level 1 keeps shutdown fast; code bodies still compress several-fold
+    with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(database.sessions)
+
+
+def load_snapshot(path: str) -> Optional[int]:
+    """Restore sessions and participants from `path` and remove it.
+
+    Returns the number of sessions restored, or None when there is no usable
+    snapshot. The file is consumed so a later crash cannot resurrect old state.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rb") as f:
+            payload = json.loads(f.read())
+    except (OSError, ValueError):
+        os.remove(path)
+        return None
+    if payload.get("format") != SNAPSHOT_FORMAT:
+        os.remove(path)
+        return None
+
+    database.sessions.update(payload["sessions"])
+    database.participants.update(payload["participants"])
+    database.rebuild_indexes()
+    os.remove(path)
+    return len(payload["sessions"])
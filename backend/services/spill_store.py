@@ -0,0 +1,40 @@
+"""Local disk store for the compressed code of idle sessions."""
+
+import os
+import shutil
+import zlib
+
+
+class SpillStore:
+    """One zlib-compressed file per spilled session under `directory`."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, session_id: str) -> str:
+        # Session IDs are server-generated UUIDs, but never trust them as paths
+        return os.path.join(self.directory, os.path.basename(session_id) + ".z")
+
+    def write(self, session_id: str, code: str) -> int:
+        """Compress and store `code`; return the number of bytes written."""
+        os.makedirs(self.directory, exist_ok=True)
+        data = zlib.compress(code.encode("utf-8"))
+        tmp_path = self._path(session_id) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(session_id))
+        return len(data)
+
+    def read(self, session_id: str) -> str:
+        with open(self._path(session_id), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """Remove every spilled document (e.g. after state has been rebuilt)."""
+        shutil.rmtree(self.directory, ignore_errors=True)
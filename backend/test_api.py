@@ -1,11 +1,16 @@
 """
 Simple test script to verify the API endpoints
 """
+import os
 import requests
 import json
+import time
 import pytest
 
 BASE_URL = "http://localhost:3000/v1"
+# Must match the server's ADMIN_TOKEN for the admin endpoint tests
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+ADMIN_HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
 
 @pytest.fixture(scope="module")
 def session_id():
@@ -51,6 +56,138 @@ def test_update_code(session_id):
     print(f"Update Code: {response.status_code}")
     assert response.status_code == 200
 
+def test_edit_code():
+    """Test applying range edits to session code"""
+    response = requests.post(
+        f"{BASE_URL}/sessions",
+        json={"title": "Edit Session", "language": "python"}
+    )
+    session_id = response.json()["id"]
+    requests.put(
+        f"{BASE_URL}/sessions/{session_id}",
+        json={"code": "a = 1\nb = 2\n", "version": 0, "clientId": "editor"}
+    )
+    response = requests.patch(
+        f"{BASE_URL}/sessions/{session_id}",
+        json={
+            "edits": [
+                {"start": {"lineNumber": 2, "column": 5}, "end": {"lineNumber": 2, "column": 6}, "text": "42"},
+                {"start": {"lineNumber": 1, "column": 1}, "end": {"lineNumber": 1, "column": 1}, "text": "# edited\n"},
+            ],
+            "version": 1,
+            "clientId": "editor",
+        }
+    )
+    print(f"Edit Code: {response.status_code}")
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert requests.get(f"{BASE_URL}/sessions/{session_id}").json()["code"] == "# edited\na = 1\nb = 42\n"
+
+    response = requests.patch(
+        f"{BASE_URL}/sessions/{session_id}",
+        json={
+            "edits": [{"start": {"lineNumber": 9, "column": 1}, "end": {"lineNumber": 9, "column": 1}, "text": "x"}],
+            "version": 2,
+            "clientId": "editor",
+        }
+    )
+    assert response.status_code == 400
+
+def test_stream_sends_edits():
+    """Test that the session stream sends code changes as range edits"""
+    response = requests.post(
+        f"{BASE_URL}/sessions",
+        json={"title": "Stream Session", "language": "python"}
+    )
+    session_id = response.json()["id"]
+    with requests.get(f"{BASE_URL}/sessions/{session_id}/stream", stream=True, timeout=10) as stream:
+        lines = stream.iter_lines(decode_unicode=True)
+        first = json.loads(next(line for line in lines if line.startswith("data: "))[len("data: "):])
+        assert first["version"] == 0
+        requests.put(
+            f"{BASE_URL}/sessions/{session_id}",
+            json={"code": first["code"] + "\nx = 1\n", "version": 0, "clientId": "streamer"}
+        )
+        event = None
+        for line in lines:
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif event == "edits" and line.startswith("data: "):
+                payload = json.loads(line[len("data: "):])
+                break
+    print(f"Edits event: {payload}")
+    assert payload["version"] == 1
+    assert payload["baseVersion"] == 0
+    assert payload["sourceClientId"] == "streamer"
+    assert payload["edits"] == [{"start": {"lineNumber": 2, "column": 23}, "end": {"lineNumber": 2, "column": 23}, "text": "\nx = 1\n"}]
+
+def test_flow_control_headers(session_id):
+    """Test that responses recommend client send intervals"""
+    response = requests.get(f"{BASE_URL}/sessions/{session_id}")
+    debounce = int(response.headers["X-Code-Debounce-Ms"])
+    throttle = int(response.headers["X-Cursor-Throttle-Ms"])
+    print(f"Flow control: debounce={debounce}ms throttle={throttle}ms")
+    assert debounce >= 400
+    assert throttle >= 150
+
+def test_session_diagnostics():
+    """Test server-side syntax diagnostics for a Python session"""
+    response = requests.post(
+        f"{BASE_URL}/sessions",
+        json={"title": "Diagnostics Session", "language": "python"}
+    )
+    session_id = response.json()["id"]
+    requests.put(
+        f"{BASE_URL}/sessions/{session_id}",
+        json={"code": "def broken(:\n    pass\n", "version": 0, "clientId": "diagnostics"}
+    )
+    for _ in range(20):
+        result = requests.get(f"{BASE_URL}/sessions/{session_id}/diagnostics").json()
+        if result["status"] == "ready":
+            break
+        time.sleep(0.1)
+    print(f"Diagnostics: {result}")
+    assert result["status"] == "ready"
+    assert result["version"] == 1
+    assert result["diagnostics"][0]["line"] == 1
+
+def test_session_files(session_id):
+    """Test that files are versioned independently of each other and the main document"""
+    session_version = requests.get(f"{BASE_URL}/sessions/{session_id}").json()["version"]
+    for path in ["src/app.py", "src/util.py"]:
+        response = requests.put(
+            f"{BASE_URL}/sessions/{session_id}/files/{path}",
+            json={"content": f"# {path}", "version": 0, "clientId": "files"}
+        )
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+
+    response = requests.put(
+        f"{BASE_URL}/sessions/{session_id}/files/src/app.py",
+        json={"content": "print('app')", "version": 1, "clientId": "files"}
+    )
+    assert response.json()["version"] == 2
+
+    response = requests.put(
+        f"{BASE_URL}/sessions/{session_id}/files/src/util.py",
+        json={"content": "stale", "version": 0, "clientId": "files"}
+    )
+    assert response.status_code == 409
+
+    response = requests.put(
+        f"{BASE_URL}/sessions/{session_id}/files/src/big.py",
+        json={"content": "x" * (256 * 1024 + 1), "version": 0, "clientId": "files"}
+    )
+    assert response.status_code == 400
+
+    manifest = requests.get(f"{BASE_URL}/sessions/{session_id}/files").json()
+    print(f"Manifest: {manifest}")
+    assert manifest["sessionVersion"] == session_version
+    assert {f["path"]: f["version"] for f in manifest["files"]} == {"src/app.py": 2, "src/util.py": 1}
+
+    response = requests.get(f"{BASE_URL}/sessions/{session_id}/files/src/app.py")
+    assert response.json()["content"] == "print('app')"
+
 def test_join_session(session_id):
     """Test joining a session"""
     response = requests.post(
@@ -63,6 +200,130 @@ def test_join_session(session_id):
     print(f"Participant ID: {participant['id']}")
     print(f"Participant Name: {participant['name']}")
 
+def test_bootstrap_session(session_id):
+    """Test joining a session and loading its state in one request"""
+    response = requests.post(
+        f"{BASE_URL}/sessions/{session_id}/bootstrap",
+        json={"name": "Bootstrap User"}
+    )
+    print(f"Bootstrap: {response.status_code}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["session"]["id"] == session_id
+    assert any(p["id"] == data["participant"]["id"] for p in data["participants"])
+    assert data["resumeToken"]
+
+    # Same name is rejected, unless it is the same participant rejoining
+    response = requests.post(
+        f"{BASE_URL}/sessions/{session_id}/bootstrap",
+        json={"name": "Bootstrap User"}
+    )
+    assert response.status_code == 409
+    response = requests.post(
+        f"{BASE_URL}/sessions/{session_id}/bootstrap",
+        json={"name": "Bootstrap User", "participantId": data["participant"]["id"]}
+    )
+    assert response.status_code == 200
+    assert response.json()["participant"]["id"] == data["participant"]["id"]
+
+def test_batch_sessions():
+    """Test creating sessions and fetching their metadata/participants in bulk"""
+    response = requests.post(
+        f"{BASE_URL}/batch/sessions",
+        json={"sessions": [{"title": f"Batch {i}", "language": "python"} for i in range(3)]}
+    )
+    print(f"Batch Create: {response.status_code}")
+    assert response.status_code == 201
+    session_ids = [s["id"] for s in response.json()]
+    assert len(session_ids) == 3
+
+    response = requests.post(
+        f"{BASE_URL}/batch/sessions/query",
+        json={"sessionIds": session_ids + ["missing-id"]}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert [s["id"] for s in result["sessions"]] == session_ids
+    assert "code" not in result["sessions"][0]
+    assert result["missing"] == ["missing-id"]
+
+    response = requests.post(
+        f"{BASE_URL}/batch/participants/query",
+        json={"sessionIds": session_ids, "countsOnly": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["counts"] == {sid: 0 for sid in session_ids}
+
+def test_admin_requires_token():
+    """Test that the admin endpoints are not publicly reachable"""
+    response = requests.get(f"{BASE_URL}/admin/sessions")
+    assert response.status_code == (403 if ADMIN_TOKEN else 404)
+    response = requests.get(f"{BASE_URL}/admin/sessions", headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == (403 if ADMIN_TOKEN else 404)
+
+@pytest.mark.skipif(not ADMIN_TOKEN, reason="ADMIN_TOKEN not set")
+def test_admin_list_sessions():
+    """Test paginating the admin session listing"""
+    for i in range(3):
+        requests.post(
+            f"{BASE_URL}/sessions",
+            json={"title": f"Listed {i}", "language": "typescript"}
+        )
+    response = requests.get(
+        f"{BASE_URL}/admin/sessions",
+        params={"language": "typescript", "limit": 2},
+        headers=ADMIN_HEADERS,
+    )
+    print(f"List Sessions: {response.status_code}")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page["sessions"]) == 2
+    assert first_page["nextCursor"]
+
+    response = requests.get(
+        f"{BASE_URL}/admin/sessions",
+        params={"language": "typescript", "limit": 2, "cursor": first_page["nextCursor"]},
+        headers=ADMIN_HEADERS,
+    )
+    second_page = response.json()
+    seen = [s["id"] for s in first_page["sessions"] + second_page["sessions"]]
+    assert len(seen) == len(set(seen))
+    activity = [s["lastActivity"] for s in first_page["sessions"] + second_page["sessions"]]
+    assert activity == sorted(activity, reverse=True)
+
+@pytest.mark.skipif(not ADMIN_TOKEN, reason="ADMIN_TOKEN not set")
+def test_memory_metrics():
+    """Test the session document memory metrics"""
+    response = requests.get(f"{BASE_URL}/admin/metrics/memory", headers=ADMIN_HEADERS)
+    print(f"Memory Metrics: {response.status_code}")
+    assert response.status_code == 200
+    metrics = response.json()
+    assert metrics["residentBytes"] > 0
+    assert metrics["residentBytes"] <= metrics["budgetBytes"]
+
+def test_code_updates_rate_limited():
+    """Test that a burst of code updates is shed with 429 and Retry-After"""
+    response = requests.post(
+        f"{BASE_URL}/sessions",
+        json={"title": "Rate Limit Session", "language": "python"}
+    )
+    session_id = response.json()["id"]
+    version = 0
+    statuses = []
+    for _ in range(60):
+        response = requests.put(
+            f"{BASE_URL}/sessions/{session_id}",
+            json={"code": "print('spam')", "version": version, "clientId": "spammer"}
+        )
+        statuses.append(response.status_code)
+        if response.status_code == 200:
+            version = response.json()["version"]
+        elif response.status_code == 429:
+            break
+    print(f"Rate limited statuses: {statuses}")
+    assert statuses[-1] == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
 if __name__ == "__main__":
     print("Testing Code Connect Live API")
     print("=" * 50)
@@ -1,6 +1,14 @@
 """Utility functions."""
 
+import base64
+import hashlib
+import json
 import random
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+from config import DEFAULT_CODE
 
 
 def generate_avatar_url(name: str) -> str:
@@ -15,3 +23,46 @@ def generate_color() -> str:
         "#98D8C8", "#F7DC6F", "#BB8FCE", "#85C1E2"
     ]
     return random.choice(colors)
+
+
+def build_session_data(title: str, language: str) -> Dict[str, Any]:
+    """Build the stored representation of a brand-new session."""
+    return {
+        "id": str(uuid.uuid4()),
+        "title": title,
+        "createdAt": datetime.utcnow().isoformat() + "Z",
+        "language": language,
+        "code": DEFAULT_CODE[language],
+        "version": 0,
+        "lastClientId": None,
+    }
+
+
+def participants_digest(participants_payload: str) -> str:
+    """Short fingerprint of a serialized participant list, as sent on the participants stream."""
+    return hashlib.sha1(participants_payload.encode()).hexdigest()[:16]
+
+
+def encode_resume_token(session: Dict[str, Any], participant_list: List[Dict[str, Any]]) -> str:
+    """Encode the state a client already has, so its streams skip re-sending it."""
+    state = {
+        "version": session.get("version", 0),
+        "language": session["language"],
+        "lastClientId": session.get("lastClientId"),
+        "participants": participants_digest(json.dumps(participant_list)),
+    }
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_resume_token(token: str) -> Dict[str, Any]:
+    """Decode a resume token; raises ValueError if it is malformed."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {
+            "version": int(state["version"]),
+            "language": str(state["language"]),
+            "lastClientId": state["lastClientId"],
+            "participants": str(state["participants"]),
+        }
+    except (TypeError, KeyError, ValueError) as exc:
+        raise ValueError("Invalid resume token") from exc
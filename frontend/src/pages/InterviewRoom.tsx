@@ -7,23 +7,29 @@ import { ShareDialog } from '@/components/ShareDialog';
 import { OutputPanel } from '@/components/OutputPanel';
 import { Button } from '@/components/ui/button';
 import {
+  applyTextEdits,
+  bootstrapSession,
   getSession,
   updateSessionCode,
   updateSessionLanguage,
-  getParticipants,
-  joinSession,
   updateParticipant,
   leaveSession,
   executeCode,
   subscribeToSession,
   subscribeToParticipants,
+  onFlowControl,
   Session,
   Participant,
+  SessionBootstrap,
   CodeExecutionResult,
 } from '@/services/api';
 import { Play, ArrowLeft, Code2, Loader2 } from 'lucide-react';
 import { useToast } from '@/hooks/use-toast';
 
+// Used until the server recommends intervals (see onFlowControl)
+const DEFAULT_CODE_DEBOUNCE_MS = 400;
+const DEFAULT_CURSOR_THROTTLE_MS = 150;
+
 const InterviewRoom = () => {
   const { sessionId } = useParams<{ sessionId: string }>();
   const navigate = useNavigate();
@@ -41,9 +47,13 @@ const InterviewRoom = () => {
   const cursorUpdateTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
   const hasLocalPendingRef = useRef(false);
   const versionRef = useRef(0);
+  const latestCodeRef = useRef('');
   const clientIdRef = useRef<string>('');
   const latestCursorRef = useRef<{ lineNumber: number; column: number } | null>(null);
+  const codeDebounceMsRef = useRef(DEFAULT_CODE_DEBOUNCE_MS);
+  const cursorThrottleMsRef = useRef(DEFAULT_CURSOR_THROTTLE_MS);
   const [currentParticipantId, setCurrentParticipantId] = useState<string | null>(null);
+  const [resumeToken, setResumeToken] = useState<string | null>(null);
 
   // Stable client id per session for echo suppression
   useEffect(() => {
@@ -61,41 +71,77 @@ const InterviewRoom = () => {
     sessionStorage.setItem(storageKey, generated);
   }, [sessionId]);
 
-  // Load session data
+  // Slow down (or speed back up) as the server's recommended intervals change
   useEffect(() => {
-    const loadSession = async () => {
-      if (!sessionId) {
-        navigate('/');
-        return;
+    return onFlowControl(({ codeDebounceMs, cursorThrottleMs }) => {
+      codeDebounceMsRef.current = codeDebounceMs;
+      cursorThrottleMsRef.current = cursorThrottleMs;
+    });
+  }, []);
+
+  // Join the session and load its state, participants and stream resume token in one round-trip
+  useEffect(() => {
+    if (!sessionId) {
+      navigate('/');
+      return;
+    }
+
+    const storageKey = `ccl-participant-${sessionId}`;
+    const storedValue = sessionStorage.getItem(storageKey);
+    let participantName: string | null = null;
+    let participantId: string | null = null;
+
+    if (storedValue) {
+      try {
+        const parsed = JSON.parse(storedValue) as { id?: string; name?: string };
+        participantName = parsed.name || null;
+        participantId = parsed.id || null;
+      } catch {
+        participantName = storedValue;
       }
+    }
 
+    if (!participantName) {
+      participantName = `Guest-${Math.random().toString(36).slice(2, 7)}`;
+      sessionStorage.setItem(storageKey, JSON.stringify({ name: participantName }));
+    }
+
+    const loadSession = async () => {
       try {
-        const [sessionData, participantsData] = await Promise.all([
-          getSession(sessionId),
-          getParticipants(sessionId),
-        ]);
-
-        if (sessionData) {
-          setSession(sessionData);
-          setCode(sessionData.code);
-          setLanguage(sessionData.language);
-          setParticipants(participantsData);
-          setVersion(sessionData.version ?? 0);
-          versionRef.current = sessionData.version ?? 0;
-        } else {
+        let bootstrap: SessionBootstrap;
+        try {
+          bootstrap = await bootstrapSession(sessionId, participantName!, participantId);
+        } catch (error) {
+          if ((error as { status?: number }).status !== 409) throw error;
+          // Someone else in the room already uses this name; join under a fresh guest name
+          bootstrap = await bootstrapSession(sessionId, `Guest-${Math.random().toString(36).slice(2, 7)}`);
+        }
+
+        const { session: sessionData, participant, participants: participantsData } = bootstrap;
+        setSession(sessionData);
+        setCode(sessionData.code);
+        latestCodeRef.current = sessionData.code;
+        setLanguage(sessionData.language);
+        setParticipants(participantsData);
+        setVersion(sessionData.version ?? 0);
+        versionRef.current = sessionData.version ?? 0;
+        setCurrentParticipantId(participant.id);
+        sessionStorage.setItem(storageKey, JSON.stringify({ id: participant.id, name: participant.name }));
+        setResumeToken(bootstrap.resumeToken);
+      } catch (error) {
+        if ((error as { status?: number }).status === 404) {
           toast({
             title: 'Session not found',
             description: 'Redirecting to home...',
             variant: 'destructive',
           });
-          navigate('/');
+        } else {
+          toast({
+            title: 'Failed to load session',
+            description: 'Please try again.',
+            variant: 'destructive',
+          });
         }
-      } catch {
-        toast({
-          title: 'Failed to load session',
-          description: 'Please try again.',
-          variant: 'destructive',
-        });
         navigate('/');
       } finally {
         setIsLoading(false);
@@ -105,24 +151,22 @@ const InterviewRoom = () => {
     loadSession();
   }, [sessionId, navigate, toast]);
 
-  // Real-time participant updates via server-sent events
+  // Real-time participant updates via server-sent events, opened once bootstrap has loaded the list
   useEffect(() => {
-    if (!sessionId) return;
+    if (!sessionId || !resumeToken) return;
 
     const cleanup = subscribeToParticipants(
       sessionId,
       (liveParticipants) => setParticipants(liveParticipants),
-      () => toast({ title: 'Connection lost', description: 'Reconnecting to participants stream.', variant: 'destructive' })
+      () => toast({ title: 'Connection lost', description: 'Reconnecting to participants stream.', variant: 'destructive' }),
+      resumeToken
     );
 
     return cleanup;
-  }, [sessionId, toast]);
-
-  const handleCodeChange = useCallback(
-    (newCode: string) => {
-      setCode(newCode);
-      hasLocalPendingRef.current = true;
+  }, [sessionId, resumeToken, toast]);
 
+  const scheduleCodeSync = useCallback(
+    (newCode: string, delayMs: number) => {
       if (!sessionId) return;
 
       if (codeUpdateTimer.current) {
@@ -130,21 +174,31 @@ const InterviewRoom = () => {
       }
 
       codeUpdateTimer.current = setTimeout(() => {
+        codeUpdateTimer.current = null;
         const baseVersion = versionRef.current;
 
         updateSessionCode(sessionId, newCode, baseVersion, clientIdRef.current)
           .then((nextVersion) => {
             versionRef.current = nextVersion;
             setVersion(nextVersion);
+            hasLocalPendingRef.current = false;
           })
           .catch((error: unknown) => {
-            const err = error as { status?: number; data?: any; message?: string };
+            const err = error as { status?: number; data?: any; message?: string; retryAfter?: number };
+            if (err.status === 429 || err.status === 503) {
+              // Server is shedding load or restarting; keep the edit pending and retry when allowed.
+              // Send the latest local text: this replaces any sync scheduled while the request was in flight
+              scheduleCodeSync(latestCodeRef.current, (err.retryAfter ?? 1) * 1000);
+              return;
+            }
+            hasLocalPendingRef.current = false;
             if (err.status === 409 && err.data) {
               const conflictVersion = err.data.version ?? baseVersion;
               const conflictCode = err.data.codeContent ?? newCode;
               versionRef.current = conflictVersion;
               setVersion(conflictVersion);
               setCode(conflictCode);
+              latestCodeRef.current = conflictCode;
               toast({
                 title: 'Update conflict',
                 description: 'Your editor caught up to the latest version.',
@@ -153,55 +207,88 @@ const InterviewRoom = () => {
               console.error('Failed to sync code', error);
               toast({ title: 'Sync issue', description: 'Unable to save code changes.', variant: 'destructive' });
             }
-          })
-          .finally(() => {
-            hasLocalPendingRef.current = false;
           });
-      }, 400);
+      }, delayMs);
     },
     [sessionId, toast]
   );
 
+  const handleCodeChange = useCallback(
+    (newCode: string) => {
+      setCode(newCode);
+      latestCodeRef.current = newCode;
+      hasLocalPendingRef.current = true;
+      scheduleCodeSync(newCode, codeDebounceMsRef.current);
+    },
+    [scheduleCodeSync]
+  );
+
   // Stream code/language changes from server for live updates
   useEffect(() => {
-    if (!sessionId) return;
+    if (!sessionId || !resumeToken) return;
 
-    const cleanup = subscribeToSession(
-      sessionId,
-      ({ code: incomingCode, language: incomingLanguage, version: incomingVersion = 0, sourceClientId }) => {
-        const currentVersion = versionRef.current;
+    // Returns true if the change came from this client (only the version is advanced)
+    const isOwnEcho = (incomingVersion: number, sourceClientId?: string) => {
+      if (!sourceClientId || sourceClientId !== clientIdRef.current) return false;
+      if (incomingVersion > versionRef.current) {
+        versionRef.current = incomingVersion;
+        setVersion(incomingVersion);
+      }
+      return true;
+    };
 
-        // Ignore echoes from this client but still advance version if needed
-        if (sourceClientId && sourceClientId === clientIdRef.current) {
-          if (incomingVersion > currentVersion) {
-            versionRef.current = incomingVersion;
-            setVersion(incomingVersion);
-          }
-          return;
-        }
+    const applySnapshot = (incomingCode: string | undefined, incomingLanguage: string | undefined, incomingVersion: number) => {
+      // Skip stale snapshots
+      if (incomingVersion <= versionRef.current) return;
 
-        // Skip stale snapshots
-        if (incomingVersion <= currentVersion) return;
+      if (incomingCode !== undefined) {
+        setCode((prev) => (incomingCode !== prev ? incomingCode : prev));
+        latestCodeRef.current = incomingCode;
+      }
 
-        if (incomingCode !== undefined) {
-          setCode((prev) => (incomingCode !== prev ? incomingCode : prev));
-        }
+      setLanguage((prev) => (incomingLanguage && incomingLanguage !== prev ? incomingLanguage : prev));
 
-        setLanguage((prev) => (incomingLanguage && incomingLanguage !== prev ? incomingLanguage : prev));
+      versionRef.current = incomingVersion;
+      setVersion(incomingVersion);
+    };
 
-        versionRef.current = incomingVersion;
-        setVersion(incomingVersion);
+    const cleanup = subscribeToSession(
+      sessionId,
+      ({ code: incomingCode, language: incomingLanguage, version: incomingVersion = 0, sourceClientId }) => {
+        if (isOwnEcho(incomingVersion, sourceClientId)) return;
+        applySnapshot(incomingCode, incomingLanguage, incomingVersion);
       },
       () =>
         toast({
           title: 'Live updates lost',
           description: 'Reconnecting to session updates.',
           variant: 'destructive',
-        })
+        }),
+      resumeToken,
+      ({ version: incomingVersion, baseVersion, sourceClientId, edits }) => {
+        if (isOwnEcho(incomingVersion, sourceClientId)) return;
+        if (incomingVersion <= versionRef.current) return;
+
+        // Edits only apply to the exact text they were made against
+        if (baseVersion === versionRef.current && !hasLocalPendingRef.current) {
+          try {
+            const nextCode = applyTextEdits(latestCodeRef.current, edits);
+            applySnapshot(nextCode, undefined, incomingVersion);
+            return;
+          } catch (error) {
+            console.error('Failed to apply session edits', error);
+          }
+        }
+
+        // Missed a version or has unsent local changes: catch up with the whole document
+        getSession(sessionId).then((latest) => {
+          if (latest) applySnapshot(latest.code, latest.language, latest.version);
+        });
+      }
     );
 
     return cleanup;
-  }, [sessionId, toast]);
+  }, [sessionId, resumeToken, toast]);
 
   const handleCursorChange = useCallback(
     (position: { lineNumber: number; column: number }) => {
@@ -228,7 +315,7 @@ const InterviewRoom = () => {
           console.error('Failed to update cursor', error);
         });
         cursorUpdateTimer.current = null;
-      }, 150);
+      }, cursorThrottleMsRef.current);
     },
     [sessionId, currentParticipantId]
   );
@@ -261,62 +348,6 @@ const InterviewRoom = () => {
     };
   }, [sessionId, currentParticipantId]);
 
-  // Ensure current visitor is registered as a participant for this session
-  useEffect(() => {
-    if (!sessionId) return;
-
-    const storageKey = `ccl-participant-${sessionId}`;
-    const storedValue = sessionStorage.getItem(storageKey);
-    let participantName: string | null = null;
-    let participantId: string | null = null;
-
-    if (storedValue) {
-      try {
-        const parsed = JSON.parse(storedValue) as { id?: string; name?: string };
-        participantName = parsed.name || null;
-        participantId = parsed.id || null;
-      } catch {
-        participantName = storedValue;
-      }
-    }
-
-    if (!participantName) {
-      participantName = `Guest-${Math.random().toString(36).slice(2, 7)}`;
-      sessionStorage.setItem(storageKey, JSON.stringify({ name: participantName }));
-    }
-
-    if (participantId) {
-      setCurrentParticipantId(participantId);
-    }
-
-    const ensureParticipant = async () => {
-      try {
-        const participant = await joinSession(sessionId, participantName!);
-        setCurrentParticipantId(participant.id);
-        sessionStorage.setItem(storageKey, JSON.stringify({ id: participant.id, name: participant.name }));
-        setParticipants((prev) => {
-          const alreadyPresent = prev.some((p) => p.id === participant.id);
-          return alreadyPresent ? prev : [...prev, participant];
-        });
-      } catch (error) {
-        const message = error instanceof Error ? error.message : '';
-        if (message.includes('already exists')) {
-          const existingList = await getParticipants(sessionId);
-          setParticipants(existingList);
-          const existing = existingList.find((p) => p.name === participantName);
-          if (existing) {
-            setCurrentParticipantId(existing.id);
-            sessionStorage.setItem(storageKey, JSON.stringify({ id: existing.id, name: existing.name }));
-          }
-        } else {
-          console.error('Failed to join session', error);
-        }
-      }
-    };
-
-    ensureParticipant();
-  }, [sessionId]);
-
   const handleLanguageChange = useCallback(
     async (newLanguage: string) => {
       setLanguage(newLanguage);
@@ -324,6 +355,7 @@ const InterviewRoom = () => {
         try {
           const { code: newCode, version: nextVersion } = await updateSessionLanguage(sessionId, newLanguage);
           setCode(newCode);
+          latestCodeRef.current = newCode;
           setExecutionResult(null);
           versionRef.current = nextVersion;
           setVersion(nextVersion);
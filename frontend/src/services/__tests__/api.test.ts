@@ -1,5 +1,13 @@
 import { describe, it, expect, vi, beforeEach } from 'vitest';
-import { createSession, getSession, executeCode } from '../api';
+import {
+  applyTextEdits,
+  createSession,
+  getSession,
+  bootstrapSession,
+  executeCode,
+  onFlowControl,
+  subscribeToSession,
+} from '../api';
 import { executeInBrowser } from '../wasmExecutor';
 
 // Mock fetch globally
@@ -89,6 +97,138 @@ describe('API Service', () => {
     });
   });
 
+  describe('bootstrapSession', () => {
+    it('joins and loads a session in one request', async () => {
+      const participant = { id: 'p1', name: 'Ann', avatar: '', color: '#4ECDC4', isOnline: true };
+      (global.fetch as any).mockResolvedValueOnce({
+        ok: true,
+        json: async () => ({
+          session: { id: '456', title: 'Room', language: 'python', code: '', version: 3, createdAt: '2024-01-01T00:00:00Z' },
+          participant,
+          participants: [participant],
+          resumeToken: 'token',
+        }),
+      });
+
+      const result = await bootstrapSession('456', 'Ann', 'p1');
+
+      expect(result.session.createdAt).toBeInstanceOf(Date);
+      expect(result.participants).toHaveLength(1);
+      expect(result.resumeToken).toBe('token');
+      expect(fetch).toHaveBeenCalledWith(
+        expect.stringContaining('/sessions/456/bootstrap'),
+        expect.objectContaining({
+          method: 'POST',
+          body: JSON.stringify({ name: 'Ann', participantId: 'p1' }),
+        })
+      );
+    });
+  });
+
+  describe('onFlowControl', () => {
+    it('reports recommended intervals from response headers', async () => {
+      const listener = vi.fn();
+      const unsubscribe = onFlowControl(listener);
+      const headers: Record<string, string> = { 'X-Code-Debounce-Ms': '800', 'X-Cursor-Throttle-Ms': '300' };
+
+      (global.fetch as any).mockResolvedValueOnce({
+        ok: true,
+        headers: { get: (name: string) => headers[name] ?? null },
+        json: async () => ({ id: '789', createdAt: '2024-01-01T00:00:00Z' }),
+      });
+
+      await getSession('789');
+      unsubscribe();
+
+      expect(listener).toHaveBeenCalledWith({ codeDebounceMs: 800, cursorThrottleMs: 300 });
+    });
+  });
+
+  describe('subscribeToSession', () => {
+    class FakeEventSource {
+      static instances: FakeEventSource[] = [];
+      onopen: (() => void) | null = null;
+      onmessage: ((event: MessageEvent) => void) | null = null;
+      onerror: (() => void) | null = null;
+      listeners: Record<string, (event: MessageEvent) => void> = {};
+      closed = false;
+
+      constructor(public url: string) {
+        FakeEventSource.instances.push(this);
+      }
+
+      addEventListener(name: string, listener: (event: MessageEvent) => void) {
+        this.listeners[name] = listener;
+      }
+
+      close() {
+        this.closed = true;
+      }
+    }
+
+    it('keeps retrying with backoff after a server restart until the stream opens', () => {
+      vi.useFakeTimers();
+      vi.stubGlobal('EventSource', FakeEventSource);
+      const onError = vi.fn();
+
+      const unsubscribe = subscribeToSession('456', () => {}, onError);
+      FakeEventSource.instances[0].listeners.reconnect({ data: JSON.stringify({ retryMs: 1000 }) } as MessageEvent);
+
+      vi.advanceTimersByTime(1000);
+      expect(FakeEventSource.instances).toHaveLength(2);
+      // New process not listening yet
+      FakeEventSource.instances[1].onerror?.();
+      vi.advanceTimersByTime(1999);
+      expect(FakeEventSource.instances).toHaveLength(2);
+      vi.advanceTimersByTime(1);
+      expect(FakeEventSource.instances).toHaveLength(3);
+      expect(onError).not.toHaveBeenCalled();
+
+      // Once connected, later failures are reported again
+      FakeEventSource.instances[2].onopen?.();
+      FakeEventSource.instances[2].onerror?.();
+      expect(onError).toHaveBeenCalledTimes(1);
+
+      unsubscribe();
+      vi.unstubAllGlobals();
+      vi.useRealTimers();
+    });
+
+    it('only sends the resume token on the first connection', () => {
+      vi.useFakeTimers();
+      vi.stubGlobal('EventSource', FakeEventSource);
+      FakeEventSource.instances = [];
+
+      const unsubscribe = subscribeToSession('456', () => {}, undefined, 'token');
+      expect(FakeEventSource.instances[0].url).toContain('?resume=token');
+
+      FakeEventSource.instances[0].listeners.reconnect({ data: JSON.stringify({ retryMs: 1000 }) } as MessageEvent);
+      vi.advanceTimersByTime(1000);
+      expect(FakeEventSource.instances[1].url).not.toContain('resume');
+
+      unsubscribe();
+      vi.unstubAllGlobals();
+      vi.useRealTimers();
+    });
+  });
+
+  describe('applyTextEdits', () => {
+    it('applies edits in order, each against the text left by the previous one', () => {
+      const result = applyTextEdits('a = 1\nb = 2\n', [
+        { start: { lineNumber: 2, column: 5 }, end: { lineNumber: 2, column: 6 }, text: '42' },
+        { start: { lineNumber: 1, column: 1 }, end: { lineNumber: 1, column: 1 }, text: '# edited\n' },
+      ]);
+
+      expect(result).toBe('# edited\na = 1\nb = 42\n');
+    });
+
+    it('rejects edits outside the text', () => {
+      expect(() =>
+        applyTextEdits('a', [{ start: { lineNumber: 3, column: 1 }, end: { lineNumber: 3, column: 1 }, text: 'x' }])
+      ).toThrow(RangeError);
+    });
+  });
+
   describe('executeCode', () => {
     const mockedExecuteInBrowser = executeInBrowser as unknown as vi.Mock;
 
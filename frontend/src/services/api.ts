@@ -32,6 +32,68 @@ export interface Participant {
   isTyping?: boolean;
 }
 
+// A range replacement; positions refer to the text left by the previous edit
+export interface TextEdit {
+  start: CursorPosition;
+  end: CursorPosition;
+  text: string;
+}
+
+// Code change sent on the session stream as range edits instead of the whole document
+export interface SessionEdits {
+  version: number;
+  baseVersion: number;
+  sourceClientId?: string;
+  edits: TextEdit[];
+}
+
+function positionToOffset(text: string, { lineNumber, column }: CursorPosition): number {
+  let lineStart = 0;
+  for (let line = 1; line < lineNumber; line++) {
+    lineStart = text.indexOf('\n', lineStart) + 1;
+    if (lineStart === 0) throw new RangeError(`Line ${lineNumber} is outside the document`);
+  }
+  const lineEnd = text.indexOf('\n', lineStart);
+  const lineLength = (lineEnd === -1 ? text.length : lineEnd) - lineStart;
+  if (column < 1 || column > lineLength + 1) {
+    throw new RangeError(`Column ${column} is outside line ${lineNumber}`);
+  }
+  return lineStart + column - 1;
+}
+
+// Apply range edits in order; throws a RangeError if one falls outside the text
+export function applyTextEdits(code: string, edits: TextEdit[]): string {
+  return edits.reduce((text, edit) => {
+    const start = positionToOffset(text, edit.start);
+    const end = positionToOffset(text, edit.end);
+    if (end < start) throw new RangeError('Edit range ends before it starts');
+    return text.slice(0, start) + edit.text + text.slice(end);
+  }, code);
+}
+
+// Server-recommended send intervals (adaptive flow control)
+export interface FlowControl {
+  codeDebounceMs: number;
+  cursorThrottleMs: number;
+}
+
+const flowControlListeners = new Set<(flow: FlowControl) => void>();
+
+// Subscribe to flow-control recommendations from response headers and the session stream
+export function onFlowControl(listener: (flow: FlowControl) => void): () => void {
+  flowControlListeners.add(listener);
+  return () => {
+    flowControlListeners.delete(listener);
+  };
+}
+
+function notifyFlowControl(flow: Partial<FlowControl>) {
+  const codeDebounceMs = Number(flow.codeDebounceMs);
+  const cursorThrottleMs = Number(flow.cursorThrottleMs);
+  if (!(codeDebounceMs > 0) || !(cursorThrottleMs > 0)) return;
+  flowControlListeners.forEach((listener) => listener({ codeDebounceMs, cursorThrottleMs }));
+}
+
 type ParticipantUpdate = Partial<
   Pick<Participant, 'cursor' | 'isTyping' | 'isOnline'>
 > & { cursor?: CursorPosition };
@@ -48,14 +110,24 @@ async function apiRequest<T>(endpoint: string, options: RequestInit = {}): Promi
     },
   });
 
+  notifyFlowControl({
+    codeDebounceMs: Number(response.headers?.get('X-Code-Debounce-Ms')),
+    cursorThrottleMs: Number(response.headers?.get('X-Cursor-Throttle-Ms')),
+  });
+
   if (!response.ok) {
     const error = await response.json().catch(() => ({ error: response.statusText }));
     const err = new Error(error.error || error.detail?.error || 'API request failed') as Error & {
       status?: number;
       data?: unknown;
+      retryAfter?: number;
     };
     err.status = response.status;
     err.data = error;
+    const retryAfter = Number(response.headers?.get('Retry-After'));
+    if (Number.isFinite(retryAfter) && retryAfter > 0) {
+      err.retryAfter = retryAfter;
+    }
     throw err;
   }
 
@@ -115,29 +187,136 @@ export async function updateSessionLanguage(sessionId: string, language: string)
   return response;
 }
 
+const DEFAULT_RECONNECT_DELAY_MS = 2000;
+const MAX_RECONNECT_DELAY_MS = 30000;
+
+// Opens an SSE stream and transparently re-opens it when the server announces a restart.
+// Until the re-opened stream connects, failures are retried with exponential backoff,
+// since the replacement process may take a while to start listening.
+// The resume token only describes the state the client had at bootstrap, so it is sent
+// on the first connection only; re-opened streams start with the full current state.
+function subscribeToStream<T>(
+  url: string,
+  label: string,
+  onMessage: (payload: T) => void,
+  onError?: () => void,
+  events: Record<string, (data: unknown) => void> = {},
+  resumeToken?: string
+): () => void {
+  let eventSource: EventSource | null = null;
+  let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  // Set while recovering from a server restart
+  let reconnectDelay: number | null = null;
+
+  const scheduleReconnect = (delay: number) => {
+    reconnectDelay = delay;
+    reconnectTimer = setTimeout(connect, delay);
+  };
+
+  let connectUrl = withResumeToken(url, resumeToken);
+
+  const connect = () => {
+    const source = new EventSource(connectUrl);
+    eventSource = source;
+    connectUrl = url;
+
+    source.onopen = () => {
+      reconnectDelay = null;
+    };
+
+    source.onmessage = (event) => {
+      try {
+        onMessage(JSON.parse(event.data) as T);
+      } catch (error) {
+        console.error(`Failed to parse ${label} stream`, error);
+      }
+    };
+
+    source.addEventListener('reconnect', (event) => {
+      source.close();
+      let delay = DEFAULT_RECONNECT_DELAY_MS;
+      try {
+        delay = (JSON.parse((event as MessageEvent).data) as { retryMs?: number }).retryMs ?? delay;
+      } catch {
+        // Keep the default delay
+      }
+      scheduleReconnect(delay);
+    });
+
+    Object.entries(events).forEach(([name, handler]) => {
+      source.addEventListener(name, (event) => {
+        try {
+          handler(JSON.parse((event as MessageEvent).data));
+        } catch (error) {
+          console.error(`Failed to parse ${label} ${name} event`, error);
+        }
+      });
+    });
+
+    source.onerror = () => {
+      source.close();
+      if (reconnectDelay !== null) {
+        scheduleReconnect(Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY_MS));
+        return;
+      }
+      if (onError) onError();
+    };
+  };
+
+  connect();
+
+  return () => {
+    if (reconnectTimer) clearTimeout(reconnectTimer);
+    eventSource?.close();
+  };
+}
+
 export function subscribeToSession(
   sessionId: string,
   onMessage: (payload: { code: string; language: string; version: number; sourceClientId?: string }) => void,
-  onError?: () => void
+  onError?: () => void,
+  resumeToken?: string,
+  onEdits?: (payload: SessionEdits) => void
 ): () => void {
-  const url = `${BASE_URL}/sessions/${sessionId}/stream`;
-  const eventSource = new EventSource(url);
-
-  eventSource.onmessage = (event) => {
-    try {
-      const data = JSON.parse(event.data) as { code: string; language: string; version: number; sourceClientId?: string };
-      onMessage(data);
-    } catch (error) {
-      console.error('Failed to parse session stream', error);
-    }
-  };
+  return subscribeToStream(
+    `${BASE_URL}/sessions/${sessionId}/stream`,
+    'session',
+    onMessage,
+    onError,
+    {
+      flow: (data) => notifyFlowControl(data as Partial<FlowControl>),
+      edits: (data) => onEdits?.(data as SessionEdits),
+    },
+    resumeToken
+  );
+}
+
+export interface SessionBootstrap {
+  session: Session;
+  participant: Participant;
+  participants: Participant[];
+  resumeToken: string;
+}
+
+// Join a session and load everything needed to render it in a single round-trip
+export async function bootstrapSession(
+  sessionId: string,
+  name: string,
+  participantId?: string | null
+): Promise<SessionBootstrap> {
+  const response = await apiRequest<SessionBootstrap>(`/sessions/${sessionId}/bootstrap`, {
+    method: 'POST',
+    body: JSON.stringify({ name, participantId: participantId ?? null }),
+  });
 
-  eventSource.onerror = () => {
-    eventSource.close();
-    if (onError) onError();
+  return {
+    ...response,
+    session: { ...response.session, createdAt: new Date(response.session.createdAt) },
   };
+}
 
-  return () => eventSource.close();
+function withResumeToken(url: string, resumeToken?: string): string {
+  return resumeToken ? `${url}?resume=${encodeURIComponent(resumeToken)}` : url;
 }
 
 export async function getParticipants(sessionId: string): Promise<Participant[]> {
@@ -190,26 +369,17 @@ export async function executeCode(code: string, language: string): Promise<CodeE
 export function subscribeToParticipants(
   sessionId: string,
   onMessage: (participants: Participant[]) => void,
-  onError?: () => void
+  onError?: () => void,
+  resumeToken?: string
 ): () => void {
-  const url = `${BASE_URL}/sessions/${sessionId}/participants/stream`;
-  const eventSource = new EventSource(url);
-
-  eventSource.onmessage = (event) => {
-    try {
-      const data = JSON.parse(event.data) as Participant[];
-      onMessage(data);
-    } catch (error) {
-      console.error('Failed to parse participants stream', error);
-    }
-  };
-
-  eventSource.onerror = () => {
-    eventSource.close();
-    if (onError) onError();
-  };
-
-  return () => eventSource.close();
+  return subscribeToStream(
+    `${BASE_URL}/sessions/${sessionId}/participants/stream`,
+    'participants',
+    onMessage,
+    onError,
+    {},
+    resumeToken
+  );
 }
 
 export type { CodeExecutionResult } from './types';